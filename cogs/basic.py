@@ -5,9 +5,12 @@ from discord import Interaction, app_commands, ui
 from discord import embeds, Color, SelectOption
 from discord.ext import commands
 from discord.channel import DMChannel, GroupChannel
+from discord.utils import utcnow
 
 from utils.logger import getLogger
 from utils.db_pg import Database
+from utils.notifier import RankNotifier
+from utils.metrics import COMMAND_SECONDS
 from objs.setting import User, getUser, Channel, getChannel
 from objs.activity import SERVER_NAME, OBJECT_TYPE
 
@@ -43,6 +46,15 @@ C_INFO = {
                 "- 預設遊戲伺服器為\"繁中服\", 預設改變對象為\"操作用戶\"",
                 "- 改變對象為\"當前頻道\"時只有具有\"管理員\"權限的成員才可使用"
             ]
+        },
+        "/notify": {
+            "description": "開啟或關閉操作用戶或當前頻道的 Top 10 變更提醒",
+            "points": [
+                "- 開啟後 Top 10 排名變更時會以私訊或頻道訊息提醒，數據所屬為指定遊戲伺服器",
+                "- 短時間內的多次變更會合併為一則訊息",
+                "- 預設改變對象為\"操作用戶\"",
+                "- 改變對象為\"當前頻道\"時只有具有\"管理員\"權限的成員才可使用"
+            ]
         }
     },
     "📊活動數據": {
@@ -143,15 +155,21 @@ class CommandsDetailView(ui.View):
         await self.update(interaction)
 
 class Basic(commands.Cog):
-    def __init__(self, bot: commands.Bot, database: Database):
+    def __init__(self, bot: commands.Bot, database: Database, notifier: RankNotifier):
         self.bot: commands.Bot = bot
         self.database: Database = database
+        self.notifier: RankNotifier = notifier
         self.logger: Logger = getLogger(__name__)
 
     @commands.Cog.listener()
     async def on_ready(self):
         self.logger.info(f"{__name__} is on ready")
 
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction: Interaction, command: app_commands.Command):
+        # Measuring every command of the bot from the creation of its interaction, which covers the queueing
+        COMMAND_SECONDS.observe((utcnow() - interaction.created_at).total_seconds(), command = command.qualified_name)
+
     @app_commands.command(name = "help", description = list(C_INFO.values())[0]["/help"]["description"])
     @app_commands.describe(verbose = "是否公開展示給所有人")
     async def help(self, interaction: Interaction, verbose: Optional[bool] = False) -> None:
@@ -169,7 +187,7 @@ class Basic(commands.Cog):
                                                         ephemeral = True, delete_after = 300); return
                 
         # Getting user status
-        user_status: User = getUser(self.database, interaction.user.id)
+        user_status: User = await self.database.run(getUser, self.database, interaction.user.id)
 
         # Generating the response to the user
         embed: embeds.Embed = embeds.Embed(
@@ -190,7 +208,7 @@ class Basic(commands.Cog):
                                                     ephemeral = True, delete_after = 300); return
                 
         # Getting channel status
-        channel_status: Channel = getChannel(self.database, interaction.channel.id)
+        channel_status: Channel = await self.database.run(getChannel, self.database, interaction.channel.id)
 
         # Generating the response to the user
         embed: embeds.Embed = embeds.Embed(
@@ -211,13 +229,14 @@ class Basic(commands.Cog):
         # Identifing the object type to change server setting
         if object == None or object.value == 0:
             # Getting user status
-            user_status: User = getUser(self.database, interaction.user.id)
+            user_status: User = await self.database.run(getUser, self.database, interaction.user.id)
 
             # Changing the default server
             if user_status.server_id == server.value:
                 result = f"用戶`{interaction.user.name}`已經指定遊戲伺服器為 \"{server.name}\""
             else:
-                self.database.insertUserSetting(interaction.user.id, server_id = server.value)
+                await self.database.aio.insertUserSetting(interaction.user.id, server_id = server.value)
+                self.notifier.subscribe(0, interaction.user.id, server.value, user_status.is_change_nofity)
                 result = f"用戶`{interaction.user.name}`指定遊戲伺服器已改為 \"{server.name}\""
         else:
             # Check if it is appropriate to used this command
@@ -232,15 +251,63 @@ class Basic(commands.Cog):
                                                         ephemeral = True, delete_after = 300); return
             
             # Getting channel status
-            channel_status: Channel = getChannel(self.database, interaction.channel.id)
+            channel_status: Channel = await self.database.run(getChannel, self.database, interaction.channel.id)
 
             # Changing the default server
             if channel_status.server_id == server.value:
                 result = f"頻道`{interaction.channel.name}`已經指定遊戲伺服器為 \"{server.name}\""
             else:
-                self.database.insertChannelSetting(interaction.channel.id, server_id = server.value)
+                await self.database.aio.insertChannelSetting(interaction.channel.id, server_id = server.value)
+                self.notifier.subscribe(1, interaction.channel.id, server.value, channel_status.is_change_notify)
                 result = f"頻道`{interaction.channel.name}`指定遊戲伺服器已改為 \"{server.name}\""
         
+        # Generating the response to the user
+        embed: embeds.Embed = embeds.Embed(title = result, color = Color.from_rgb(r = 51, g = 51, b = 255))
+        await interaction.response.send_message(embed = embed, ephemeral = True, delete_after = 300)
+
+    @app_commands.command(name = "notify", description = list(C_INFO.values())[0]["/notify"]["description"])
+    @app_commands.describe(enable = "是否開啟 Top 10 變更提醒")
+    @app_commands.describe(object = "改變 Top 10 變更提醒設定的對象")
+    @app_commands.choices(object = [app_commands.Choice(name = object_type, value = object_id)
+                                    for object_id, object_type in enumerate(OBJECT_TYPE)])
+    async def notify(self, interaction: Interaction, enable: bool, 
+                     object: Optional[app_commands.Choice[int]] = None) -> None:
+        # Identifing the object type to change notify setting
+        state = "開啟" if enable else "關閉"
+        if object == None or object.value == 0:
+            # Getting user status
+            user_status: User = await self.database.run(getUser, self.database, interaction.user.id)
+
+            # Changing the notify setting
+            if user_status.is_change_nofity == enable:
+                result = f"用戶`{interaction.user.name}`已經{state} Top 10 變更提醒"
+            else:
+                await self.database.aio.insertUserSetting(interaction.user.id, is_change_notify = enable)
+                self.notifier.subscribe(0, interaction.user.id, user_status.server_id, enable)
+                result = f"用戶`{interaction.user.name}`已{state} Top 10 變更提醒"
+        else:
+            # Check if it is appropriate to used this command
+            if isinstance(interaction.channel, (DMChannel, GroupChannel)):
+                await interaction.response.send_message("該指令無法在私聊頻道中使用", 
+                                                        ephemeral = True, delete_after = 300); return
+            if self.bot.get_guild(interaction.guild_id) is None: 
+                await interaction.response.send_message("該指令無法在機器人不在的伺服器中使用", 
+                                                        ephemeral = True, delete_after = 300); return
+            if not interaction.user.guild_permissions.administrator: 
+                await interaction.response.send_message("您沒有權限使用該指令", 
+                                                        ephemeral = True, delete_after = 300); return
+            
+            # Getting channel status
+            channel_status: Channel = await self.database.run(getChannel, self.database, interaction.channel.id)
+
+            # Changing the notify setting
+            if channel_status.is_change_notify == enable:
+                result = f"頻道`{interaction.channel.name}`已經{state} Top 10 變更提醒"
+            else:
+                await self.database.aio.insertChannelSetting(interaction.channel.id, is_change_notify = enable)
+                self.notifier.subscribe(1, interaction.channel.id, channel_status.server_id, enable)
+                result = f"頻道`{interaction.channel.name}`已{state} Top 10 變更提醒"
+        
         # Generating the response to the user
         embed: embeds.Embed = embeds.Embed(title = result, color = Color.from_rgb(r = 51, g = 51, b = 255))
         await interaction.response.send_message(embed = embed, ephemeral = True, delete_after = 300)
\ No newline at end of file
@@ -1,9 +1,9 @@
-from typing import Optional
+from typing import Optional, Union
 from pathlib import Path
 from environs import Env
 from logging import Logger
 
-import gc
+import gc, asyncio
 from multiprocessing import Process
 
 import discord
@@ -12,7 +12,11 @@ from discord import app_commands
 
 from utils.db_pg import Database
 from utils.api import API
+from utils.http import HTTPClient
 from utils.logger import getLogger
+from utils.cache import SnapshotCache
+from utils.notifier import RankNotifier
+from utils.metrics import REGISTRY
 from objs.activity import SERVER_NAME
 
 from cogs.basic import Basic
@@ -27,24 +31,56 @@ class SDBot(commands.Bot):
         # Setting up the connection to database
         self.database: Database = Database(
             host = env.str("DB_HOST"), name = env.str("DB_NAME"), user = env.str("DB_USER"),
-            password = env.str("DB_PASSWORD"), port = env.int("DB_PORT"), logger = self.logger)
-        self.database.createTableForUsers()
-        self.database.createTableForChannels()
-        self.database.createTableForEvents()
-        self.database.createTableForMonthlys()
+            password = env.str("DB_PASSWORD"), port = env.int("DB_PORT"), logger = self.logger,
+            pool_size = env.int("DB_POOL_SIZE", 4), slow_query_ms = env.int("DB_SLOW_QUERY_MS", 0), 
+            slow_log_path = Path("../.log") / "database.slow.txt")
+        self.database.migrate()
         
-        # Setting up the connection to fetch game data
-        self.apis: list[Process] = [Process(target = API, args = (index, Path("../.env"), Path("../.log"), )) 
-                                    for index in range(4)]
-        for api in self.apis: api.start()
+        # Setting up the exporter of metrics, shared by the cogs, the database and collectors in task mode
+        self.metrics_port: int = env.int("METRICS_PORT", 0)
+        if self.metrics_port != 0: REGISTRY.serve(self.metrics_port)
+        
+        # Setting up the cache of computed results, which is invalidated by snapshots from the collector
+        self.cache: SnapshotCache = SnapshotCache()
+        
+        # Setting up the connection to fetch game data, either as a process per server or, in task mode,
+        # as tasks sharing the connection pool and HTTP client of the bot, which are started in setup hook
+        self.collector_mode: str = env.str("COLLECTOR_MODE", "process")
+        self.apis: list[Union[Process, asyncio.Task]] = []
+        if self.collector_mode == "process":
+            self.apis = [Process(target = API, args = (index, Path("../.env"), Path("../.log"), )) for index in range(4)]
+            for api in self.apis: api.start()
         return
     
+    def startCollector(self, server_id: int) -> asyncio.Task:
+        api = API(server_id, Path("../.env"), Path("../.log"), database = self.database, http = self.collector_http)
+        return asyncio.create_task(api.monitor(), name = f"collector.{server_id}")
+    
     async def setup_hook(self) -> None:
-        await self.add_cog(Basic(self, self.database))
-        await self.add_cog(Check(self, self.database))
+        if self.collector_mode == "task":
+            self.collector_http: HTTPClient = HTTPClient()
+            self.apis = [self.startCollector(index) for index in range(4)]
+        
+        self.listener: asyncio.Task = asyncio.create_task(
+            self.database.listen(["snapshot", "metadata"], self.onNotification))
+        
+        # Setting up the dispatcher of rank changes, which are pushed by the collector through the database
+        self.notifier: RankNotifier = RankNotifier(self, self.database); await self.notifier.load()
+        self.rank_listener: asyncio.Task = asyncio.create_task(
+            self.database.listen(["event_ranks"], self.notifier.onRankChange))
+        self.dispatcher: asyncio.Task = asyncio.create_task(self.notifier.dispatch())
+        
+        await self.add_cog(Basic(self, self.database, self.notifier))
+        await self.add_cog(Check(self, self.database, self.cache))
         self.synced = await self.tree.sync()
         return
 
+    def onNotification(self, channel: str, payload: str) -> None:
+        # Routing writes announced by the collector, which drop computed results or cached metadata
+        if channel == "snapshot": self.cache.onSnapshot(channel, payload)
+        else: self.database.onMetadata(channel, payload)
+        return
+
     async def on_ready(self) -> None:
         self.logger.info("SDBot is online")
         return
@@ -65,9 +101,15 @@ if __name__ == "__main__":
                                 for server_id, server_name in enumerate(SERVER_NAME)])
     async def reload(interaction: discord.Interaction, server: app_commands.Choice[int]) -> None:
         server_id = server.value
-        bot.apis[server_id].terminate(); bot.apis[server_id].join()
-        bot.apis[server_id] = Process(target = API, args = (server_id, Path("../.env"), Path("../.log"), ))
-        gc.collect(); bot.apis[server_id].start()
+        if bot.collector_mode == "task":
+            bot.apis[server_id].cancel()
+            try: await bot.apis[server_id]
+            except asyncio.CancelledError: pass
+            bot.apis[server_id] = bot.startCollector(server_id)
+        else:
+            bot.apis[server_id].terminate(); bot.apis[server_id].join()
+            bot.apis[server_id] = Process(target = API, args = (server_id, Path("../.env"), Path("../.log"), ))
+            gc.collect(); bot.apis[server_id].start()
         await interaction.response.send_message(f"收集**{server.name}**資料的API已重新加載", ephemeral = True); return
     
     # Defining command for bot owner to refresh database connection
@@ -76,7 +118,9 @@ if __name__ == "__main__":
     async def refresh(interaction: discord.Interaction) -> None:
         bot.database = Database(
             host = env.str("DB_HOST"), name = env.str("DB_NAME"), user = env.str("DB_USER"),
-            password = env.str("DB_PASSWORD"), port = env.int("DB_PORT"), logger = bot.logger); gc.collect()
+            password = env.str("DB_PASSWORD"), port = env.int("DB_PORT"), logger = bot.logger,
+            pool_size = env.int("DB_POOL_SIZE", 4), slow_query_ms = env.int("DB_SLOW_QUERY_MS", 0), 
+            slow_log_path = Path("../.log") / "database.slow.txt"); gc.collect()
         await interaction.response.send_message(f"機器人與數據庫間的連接已刷新", ephemeral = True); return
     
     # Defining command for bot owner to inform user with bot status
@@ -1,4 +1,5 @@
 import math
+from typing import Optional
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
@@ -25,23 +26,8 @@ class EventPlayer:
         return
     
 def getEventTopPlayers(database: Database, server_id: int, event: EventInfo, request_time: int) -> list[EventPlayer]:
-    # Collecting data of current top 10 player
-    players_data: list[list] = database.selectEventTopPlayers(server_id, event.id)
-    players_data = [player_data[:-2] + [player_data[-1], 
-            database.selectEventPlayerUpsTime(server_id, event.id, player_data[2], 1)[0], player_data[-2]] 
-        for player_data in players_data]
-    players_data = [player_data + [i + 1, -1 if ((request_time - player_data[-2]) <= 3600) else
-            (player_data[8] - database.selectEventPlayerPointsAtTime(server_id, event.id, player_data[2], 
-                                                                     before = request_time - 3600, limit = 1)[0][0])] 
-        for i, player_data in enumerate(players_data)]
-    
-    # Counting speed rank of current top 10 player
-    to_speed_rank: list[tuple[int, int]] = [(player_data[-2] - 1, player_data[-1]) for player_data in players_data]
-    to_speed_rank = sorted(to_speed_rank, key = lambda x: x[1], reverse = True)
-    players_data[to_speed_rank[0][0]].append(1)
-    for last_to, now_to in zip(to_speed_rank[:-1], to_speed_rank[1:]):
-        if last_to[1] == now_to[1]: players_data[now_to[0]].append(players_data[last_to[0]][-1])
-        else: players_data[now_to[0]].append(players_data[last_to[0]][-1] + 1)
+    # Collecting data of current top 10 player with speed and ranks already counted by database
+    players_data: list[list] = database.selectEventTopPlayersWithSpeed(server_id, event.id, request_time)
         
     # Creating objects from data
     return [EventPlayer(player_data) for player_data in players_data]
@@ -59,23 +45,26 @@ class EventPlayerDetail(EventPlayer):
         self.recent_point_changes: list[tuple[int, int]] = data[3]
         self.recent_ranges_detail: list[tuple[int, int, int, int]] = data[4]
         
-def getEventTopPlayerDetail(database: Database, server_id: int, event: EventInfo, 
-                            request_time: int, point_rank: int) -> EventPlayerDetail:
-    # Collecting top players info
-    players: list[EventPlayer] = getEventTopPlayers(database, server_id, event, request_time); point_rank -= 1
-    player: EventPlayer = players[point_rank]
+def getEventTopPlayerDetail(database: Database, server_id: int, event: EventInfo, request_time: int, 
+                            point_rank: int, players: Optional[list[EventPlayer]] = None) -> EventPlayerDetail:
+    # Collecting top players info if it is not provided by caller
+    if players == None: players = getEventTopPlayers(database, server_id, event, request_time)
+    point_rank -= 1; player: EventPlayer = players[point_rank]
     
-    # Collecting player detail from database
+    # Counting the ranges to be summarized and Collecting player detail from database
+    ranges_time: list[int] = []
+    for time in [3600, 7200, 43200, 86400]:
+        after_time = request_time - time
+        if after_time <= event.start_at and after_time <= player.recent_up_time: break
+        ranges_time.append(time)
+    points_num, player_ups_time, to_recent_point_changes, to_recent_ranges_detail = database.selectEventPlayerDetail(
+        server_id, event.id, player.uid, player.recent_up_time, [request_time - time for time in ranges_time])
     player_detail_data: list = []
     player_detail_data.append(0 if point_rank == 0 else (players[point_rank - 1].point - player.point))
-    player_detail_data.append(0 if point_rank == 9 else (player.point - players[point_rank + 1].point))
-    player_detail_data.append(database.selectEventPlayerPointsNumAtTime(server_id, event.id, player.uid) - 1)
+    player_detail_data.append(0 if point_rank == len(players) - 1 else (player.point - players[point_rank + 1].point))
+    player_detail_data.append(points_num - 1)
     
     # Counting recent point changes
-    player_ups_time: list[int] = database.selectEventPlayerUpsTime(server_id, event.id, player.uid)
-    to_recent_point_changes: list[list[int]] = database.selectEventPlayerPointsAtTime(
-        server_id, event.id, player.uid, after = player.recent_up_time, 
-        limit = 21 + len(player_ups_time), with_time = True)
     player_detail_data.append([])
     for now_to, last_to in zip(to_recent_point_changes[:-1], to_recent_point_changes[1:]):
         if now_to[0] in player_ups_time: continue
@@ -84,13 +73,8 @@ def getEventTopPlayerDetail(database: Database, server_id: int, event: EventInfo
         
     # Counting recent ranges detail
     player_detail_data.append([])
-    for time in [3600, 7200, 43200, 86400]:
-        after_time = request_time - time
-        if after_time <= event.start_at and after_time <= player.recent_up_time: break
-        point_changes = database.selectEventPlayerPointsNumAtTime(
-            server_id, event.id, player.uid, after = after_time) - 1
-        point_before = database.selectEventPlayerPointsAtTime(
-            server_id, event.id, player.uid, before = after_time, limit = 1)[0][0]
+    for time, (point_changes, point_before) in zip(ranges_time, to_recent_ranges_detail):
+        after_time = request_time - time; point_changes -= 1
         if point_changes <= 0: player_detail_data[-1].append((after_time, 0, 0, 0))
         else: player_detail_data[-1].append((after_time, point_changes, round(time / point_changes), 
                                              round((player.point - point_before) / point_changes)))
@@ -111,11 +95,12 @@ class EventPlayerDaily(EventPlayer):
         self.stop_intervals: list[list[tuple[tuple[int, int], int]]] = data[4]
         self.rank_changes: list[list[tuple[int, tuple[int, int]]]] = data[5]
         
-def getEventTopPlayerDaily(database: Database, server_id: int, event: EventInfo, 
-                           request_time: int, timezone: ZoneInfo, point_rank: int) \
+def getEventTopPlayerDaily(database: Database, server_id: int, event: EventInfo, request_time: int, 
+                           timezone: ZoneInfo, point_rank: int, players: Optional[list[EventPlayer]] = None) \
     -> tuple[EventPlayerDaily, list[int]]:
-    # Collecting top players info and Counting time splits day by day
-    player: EventPlayer = getEventTopPlayers(database, server_id, event, request_time)[point_rank - 1]
+    # Collecting top players info if it is not provided by caller and Counting time splits day by day
+    if players == None: players = getEventTopPlayers(database, server_id, event, request_time)
+    player: EventPlayer = players[point_rank - 1]
     day_split: list[int] = [event.start_at]
     last_day_split_datetime: datetime \
         = datetime.fromtimestamp(day_split[-1], tz = timezone).replace(hour = 0, minute = 0, second = 0, microsecond = 0)
@@ -124,23 +109,28 @@ def getEventTopPlayerDaily(database: Database, server_id: int, event: EventInfo,
         if day_split[-1] > min(request_time, event.end_at): day_split[-1] = min(request_time, event.end_at); break
     player_daily_data: list = []
     
-    # Collecting and Processing point data from database
-    to_point_delta: list[int] \
-        = [database.selectEventPlayerPointsAtTime(server_id, event.id, player.uid, before = split, limit = 1)[0][0]
-           for split in day_split]
+    # Collecting all daily data from database in one bucketed query
+    to_daily_points, to_hourly_points_num, to_stop, to_rank_changes = database.selectEventPlayerDaily(
+        server_id, event.id, player.uid, event.start_at, day_split)
+    
+    # Processing point data, where the points before a split are the highest one in the buckets before
+    daily_points: dict[int, int] = {bucket: value for bucket, value in to_daily_points}
+    to_point_delta: list[int] = []
+    for bucket in range(len(day_split)): 
+        to_point_delta.append(max([daily_points.get(bucket, 0)] + to_point_delta[-1:]))
     player_daily_data.append([now_point - last_point for now_point, last_point 
                               in zip(to_point_delta[1:], to_point_delta[:-1])])
-    to_point_change_times: list[int] = database.selectEventPlayerPointsNumHourly(
-        server_id, event.id, player.uid, event.start_at, 
-        int((min(request_time, event.end_at) - event.start_at) // 3600) + 1); player_daily_data += [[], []]
+    to_point_change_times: list[int] = [0 for _ in range(int((min(request_time, event.end_at) - event.start_at) // 3600) + 1)]
+    for index, num in to_hourly_points_num: 
+        if 0 <= index < len(to_point_change_times): to_point_change_times[index] = num
+    player_daily_data += [[], []]
     for now_split, last_split in zip(day_split[1:], day_split[:-1]):
         num = min(int(math.ceil((now_split - last_split) / 3600)), len(to_point_change_times))
         player_daily_data[-2].append(sum(to_point_change_times[:num]))
         player_daily_data[-1].append(to_point_change_times[:num])
         if len(to_point_change_times) > num: to_point_change_times = to_point_change_times[num:]
         
-    # Collecting and Processing stop data from database
-    to_stop: list[list[int]] = database.selectEventPlayerIntervals(server_id, event.id, player.uid)
+    # Processing stop data
     if min(request_time, event.end_at) - player.last_update_time >= 1200: to_stop.append(
         [player.last_update_time, min(request_time, event.end_at), 0])
     player_daily_data += [[0 for _ in range(len(day_split) - 1)], [[] for _ in range(len(day_split) - 1)]]; index = 0
@@ -153,8 +143,7 @@ def getEventTopPlayerDaily(database: Database, server_id: int, event: EventInfo,
             if to[1] > day_split[index + 1]: index += 1
             else: break
             
-    # Collecting and Processing rank changes data from database
-    to_rank_changes: list[list[int]] = database.selectEventPlayerRanks(server_id, event.id, player.uid)
+    # Processing rank changes data
     player_daily_data += [[[] for _ in range(len(day_split) - 1)]]; index = 0
     for to in to_rank_changes:
         while to[0] > day_split[index + 1]: index += 1
@@ -31,9 +31,10 @@ class Channel:
         # Initializing object with data provided
         self.id: int = data[0]
         self.server_id: int = data[1]
+        self.is_change_notify: bool = data[2]
         
 def getChannel(database: Database, channel_id: int) -> Channel:
     # Creating object and Confirming the existance in database
     channel_data: list = database.selectChannelSetting(channel_id)
-    if channel_data == []: database.insertChannelSetting(channel_id); return Channel([channel_id, 2])
+    if channel_data == []: database.insertChannelSetting(channel_id); return Channel([channel_id, 2, False])
     else: return Channel(channel_data)
\ No newline at end of file
@@ -0,0 +1,85 @@
+import asyncio
+from contextlib import contextmanager
+
+from utils.api import API
+
+def makeAPI() -> API:
+    # Skipping the constructor, which reads the environment and starts monitoring
+    api = API.__new__(API); api.last_seen = {}; api.writes = {"event": 0, "monthly": 0}
+    return api
+
+def test_diff_snapshot_sends_everything_first():
+    api = makeAPI()
+    players = [[1, "a", "hi", 10], [2, "b", "yo", 20]]
+    points = [[1, 500, 1700000000], [2, 800, 1700000000]]
+    assert api._API__diffSnapshot(("event", 100), players, points) == (players, [1, 2], points)
+
+def test_diff_snapshot_sends_only_changes_after_mark():
+    api = makeAPI()
+    players = [[1, "a", "hi", 10], [2, "b", "yo", 20]]
+    points = [[1, 500, 1700000000], [2, 800, 1700000000]]
+    api._API__markSnapshot(("event", 100), players, points)
+    assert api._API__diffSnapshot(("event", 100), players, points) == ([], [], [])
+    
+    players = [[1, "a", "hello", 10], [2, "b", "yo", 20], [3, "c", "", 30]]
+    points = [[1, 500, 1700000000], [2, 900, 1700000060], [3, 100, 1700000060]]
+    assert api._API__diffSnapshot(("event", 100), players, points) \
+        == ([[1, "a", "hello", 10], [3, "c", "", 30]], [3], [[2, 900, 1700000060], [3, 100, 1700000060]])
+
+def test_diff_snapshot_resends_unmarked_rows():
+    api = makeAPI()
+    players = [[1, "a", "hi", 10]]; points = [[1, 500, 1700000000]]
+    api._API__diffSnapshot(("event", 100), players, points)
+    assert api._API__diffSnapshot(("event", 100), players, points) == (players, [1], points)
+
+def test_diff_snapshot_forgets_older_activities_of_the_same_kind():
+    api = makeAPI()
+    players = [[1, "a", "hi", 10]]; points = [[1, 500, 1700000000]]
+    api._API__markSnapshot(("event", 100), players, points)
+    api._API__markSnapshot(("monthly", 7), players, points)
+    assert api._API__diffSnapshot(("event", 101), players, points) == (players, [1], points)
+    assert list(api.last_seen.keys()) == [("monthly", 7)]
+
+class StubDatabase:
+    def __init__(self, schedules: list[list[int]]):
+        self.schedules = schedules; self.details: list[list] = []
+
+    async def run(self, function, *args): 
+        return function(*args)
+
+    @contextmanager
+    def transaction(self): 
+        yield None
+
+    def selectEventSchedules(self, server_id: int, event_ids: list[int]) -> list[list[int]]:
+        return [schedule for schedule in self.schedules if schedule[0] in event_ids]
+
+    def insertEventDetail(self, server_id: int, *event) -> None:
+        self.details.append(list(event)); return
+
+def test_fetch_recent_events_only_fetches_changed_schedules():
+    api = makeAPI(); api.server_id = 0; api.parser = None; requested = []
+    api.database = StubDatabase([[100, 1700000000, 1700600000], [101, 1701000000, 1701600000]])
+    def listed(start_at, end_at): return {"startAt": [start_at, None], "endAt": [end_at, None]}
+    recent = {"events": {"100": listed("1700000000000", "1700600000000"), "101": listed("1701000000000", "1701700000000"), 
+                         "102": listed("1702000000000", "1702600000000"), "103": listed(None, None)}}
+    async def getData(url: str, timeout: float = 4, conditional: bool = False) -> dict:
+        if url.endswith("recent.json"): return recent
+        requested.append(url); event_id = url.split("/")[-1][:-len(".json")]
+        return {"eventName": ["name"], "eventType": "versus", **recent["events"][event_id]}
+    api._API__getDataFromBestdori = getData
+    assert asyncio.run(api._API__fetchRecentEvents())
+    assert requested == ["https://bestdori.com/api/events/101.json", "https://bestdori.com/api/events/102.json"]
+    assert [detail[0] for detail in api.database.details] == [101, 102]
+    assert api.database.details[0][3:] == [1701000000, 1701700000]
+
+def test_poll_event_top_fetches_full_history_after_a_failure():
+    api = makeAPI(); api.flag = True; api.backoffs = {"event": 1, "monthly": 1}; fetched = []
+    api.recent_event = type("Event", (), {"start_at": 0, "end_at": 1 << 40})()
+    async def fetch(kind: str, is_success: bool) -> bool: 
+        fetched.append(kind); return is_success
+    results = iter([False, True, True])
+    api._API__fetchEventTop = lambda event: fetch("top", next(results))
+    api._API__fetchFullEventTop = lambda event: fetch("full", next(results))
+    for _ in range(3): asyncio.run(api._API__pollEventTop())
+    assert fetched == ["top", "full", "top"]
@@ -0,0 +1,87 @@
+import asyncio, gc
+
+import pytest
+
+from utils.cache import TTLCache, SnapshotCache
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("utils.cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(ttl = 10)
+    cache.set(("user_setting", 1), [1, 2])
+    assert cache.get(("user_setting", 1)) == [1, 2]
+    now[0] += 11
+    assert cache.get(("user_setting", 1)) == None
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size = 2)
+    cache.set(("a", 1), 1); cache.set(("b", 1), 2)
+    cache.get(("a", 1)); cache.set(("c", 1), 3)
+    assert cache.get(("a", 1)) == 1
+    assert cache.get(("b", 1)) == None
+    assert cache.get(("c", 1)) == 3
+
+def test_ttl_cache_rejects_write_back_after_invalidate():
+    cache = TTLCache()
+    version = cache.version(("recent_event_detail", 0))
+    cache.invalidate(("recent_event_detail", 0))
+    cache.set(("recent_event_detail", 0), ["stale"], version)
+    assert cache.get(("recent_event_detail", 0)) == None
+    
+    version = cache.version(("recent_event_detail", 0))
+    cache.set(("recent_event_detail", 0), ["fresh"], version)
+    assert cache.get(("recent_event_detail", 0)) == ["fresh"]
+
+def test_snapshot_cache_shares_one_computation():
+    cache = SnapshotCache(); calls = []
+    async def compute():
+        calls.append(1); await asyncio.sleep(0.01); return "top"
+    async def main():
+        return await asyncio.gather(*[cache.fetch(("event", 0, 1), ("top",), compute) for _ in range(3)])
+    assert asyncio.run(main()) == ["top", "top", "top"]
+    assert len(calls) == 1
+
+def test_snapshot_cache_invalidates_on_snapshot():
+    cache = SnapshotCache()
+    cache.set(("event", 0, 1), ("top",), "old")
+    cache.set(("event", 0, 2), ("top",), "other")
+    cache.onSnapshot("snapshot", "event:0:1:1700000000")
+    assert cache.get(("event", 0, 1), ("top",)) == None
+    assert cache.get(("event", 0, 2), ("top",)) == "other"
+
+def test_snapshot_cache_passes_failures_to_waiters_without_logging():
+    cache = SnapshotCache(); errors = []
+    async def compute():
+        await asyncio.sleep(0.01); raise ValueError("failed")
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        results = await asyncio.gather(*[cache.fetch(("event", 0, 1), ("top",), compute) for _ in range(2)], 
+                                       return_exceptions = True)
+        with pytest.raises(ValueError): await cache.fetch(("event", 0, 1), ("top",), compute)
+        gc.collect(); await asyncio.sleep(0)
+        return results
+    assert [type(result) for result in asyncio.run(main())] == [ValueError, ValueError]
+    assert errors == []
+
+def test_snapshot_cache_recomputes_for_waiters_when_cancelled():
+    cache = SnapshotCache(); calls = []
+    async def compute():
+        calls.append(1); await asyncio.sleep(0.01); return "top"
+    async def main():
+        first = asyncio.create_task(cache.fetch(("event", 0, 1), ("top",), compute))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.fetch(("event", 0, 1), ("top",), compute))
+        await asyncio.sleep(0); first.cancel()
+        with pytest.raises(asyncio.CancelledError): await first
+        return await second
+    assert asyncio.run(main()) == "top"
+    assert len(calls) == 2
+
+def test_snapshot_cache_drops_expired_results(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("utils.cache.time.monotonic", lambda: now[0])
+    cache = SnapshotCache(max_age = 90)
+    cache.set(("event", 0, 1), ("top",), "old")
+    now[0] += 91
+    cache.set(("event", 0, 2), ("top",), "new")
+    assert list(cache.entries.values()) == [(191.0, "new")]
@@ -0,0 +1,199 @@
+import asyncio, time
+from collections import deque
+from typing import Any, Optional
+
+import pytest
+
+from utils import db_pg
+from utils.db_pg import Database
+
+class StubStatement:
+    def __init__(self, connection: "StubConnection", command: str):
+        self.connection = connection; self.command = command
+
+    def run(self, **params) -> Any:
+        return self.connection.run(self.command, **params)
+
+class StubCursor:
+    def __init__(self, connection: "StubConnection"):
+        self.connection = connection; self.command: Optional[str] = None
+
+    def execute(self, command: str, args: Optional[tuple] = None, stream: Optional[Any] = None) -> None:
+        self.command = command; self.connection.executed.append((command, {}))
+        if stream != None: self.connection.copied.extend(stream)
+        return
+
+    def fetchall(self) -> Any:
+        return self.connection.respond(self.command)
+
+    def close(self) -> None:
+        return
+
+class StubConnection:
+    # Recording every command instead of sending it, and Answering the ones matching a pattern in responses
+    def __init__(self):
+        self.executed: list[tuple[str, dict]] = []
+        self.prepared: list[str] = []
+        self.copied: list[str] = []
+        self.responses: dict[str, Any] = {}
+        self.notifications: deque = deque()
+        self.commits: int = 0
+        self.rollbacks: int = 0
+
+    def respond(self, command: str) -> Any:
+        for pattern, result in self.responses.items():
+            if pattern in command: return result
+        return ()
+
+    def prepare(self, command: str) -> StubStatement:
+        self.prepared.append(command); return StubStatement(self, command)
+
+    def cursor(self) -> StubCursor:
+        return StubCursor(self)
+
+    def run(self, command: str, **params) -> Any:
+        self.executed.append((command, params)); return self.respond(command)
+
+    def commit(self) -> None:
+        self.commits += 1; return
+
+    def rollback(self) -> None:
+        self.rollbacks += 1; return
+
+    def close(self) -> None:
+        return
+
+@pytest.fixture
+def connection(monkeypatch) -> StubConnection:
+    connection = StubConnection()
+    monkeypatch.setattr(db_pg.pg8000, "connect", lambda **config: connection)
+    return connection
+
+@pytest.fixture
+def database(connection: StubConnection) -> Database:
+    return Database("localhost", "stare", "stare", "", 5432)
+
+def test_insert_unnest_binds_columns_as_arrays(database):
+    insert = database._Database__insertUnnest("event_points", ["serverId", "eventId", "uid", "value"],
+                                              ["CAST(:server_id AS SMALLINT)", "CAST(:event_id AS SMALLINT)", "uid", "value"],
+                                              {"uid": "BIGINT", "value": "INTEGER"},
+                                              ["serverId", "eventId", "uid", "value"], "NOTHING")
+    assert insert == "INSERT INTO event_points (serverId, eventId, uid, value) " \
+                   + "SELECT CAST(:server_id AS SMALLINT), CAST(:event_id AS SMALLINT), uid, value " \
+                   + "FROM UNNEST(CAST(:uid AS BIGINT[]), CAST(:value AS INTEGER[])) AS data (uid, value) " \
+                   + "ON CONFLICT (serverId, eventId, uid, value) DO NOTHING;"
+
+def test_insert_event_points_sends_one_parameterized_statement(database, connection):
+    database.insertEventPoints(0, 100, [[1, 500, 1700000000], [2, 800, 1700000060]])
+    command, params = connection.executed[-1]
+    assert ":uid" in command and "1700000000" not in command
+    assert params == {"server_id": 0, "event_id": 100, "uid": [1, 2], "value": [500, 800],
+                      "time": [1700000000, 1700000060]}
+    assert connection.commits == 1
+
+def test_prepared_statements_are_cached_per_connection(database, connection):
+    database.insertEventPoints(0, 100, [[1, 500, 1700000000]])
+    database.insertEventPoints(0, 100, [[1, 600, 1700000060], [2, 800, 1700000060]])
+    assert len(connection.prepared) == 1
+    assert len(connection.executed) == 2
+
+def test_migrations_have_unique_names(database):
+    names = [name for name, _ in database._Database__migrations()]
+    assert len(set(names)) == len(names)
+
+def test_migrate_costs_one_query_when_up_to_date(database, connection):
+    connection.responses["MAX(version)"] = ((len(database._Database__migrations()),),)
+    database.migrate()
+    assert len(connection.executed) == 1
+
+def test_migrate_applies_pending_versions_in_order(database, connection):
+    migrations = database._Database__migrations()
+    connection.responses["MAX(version)"] = ((len(migrations) - 2,),)
+    database.migrate()
+    commands = [command for command, _ in connection.executed]
+    recorded = [params for command, params in connection.executed if command.startswith("INSERT INTO schema_version")]
+    assert recorded == [{"version": len(migrations) - 1, "name": migrations[-2][0]},
+                        {"version": len(migrations), "name": migrations[-1][0]}]
+    assert commands.index("LOCK TABLE schema_version IN EXCLUSIVE MODE;") < commands.index(
+        next(command for command in commands if command.startswith("INSERT INTO schema_version")))
+
+def test_create_partition_builds_list_partitions(database):
+    create = database._Database__createPartition
+    assert create("event_points_s0", "event_points", ["0"], "LIST (eventId)") \
+        == "CREATE TABLE IF NOT EXISTS event_points_s0 PARTITION OF event_points FOR VALUES IN (0) PARTITION BY LIST (eventId);"
+    assert create("event_points_s0_e100", "event_points_s0", ["100"]) \
+        == "CREATE TABLE IF NOT EXISTS event_points_s0_e100 PARTITION OF event_points_s0 FOR VALUES IN (100);"
+    assert create("event_points_default", "event_points") \
+        == "CREATE TABLE IF NOT EXISTS event_points_default PARTITION OF event_points DEFAULT;"
+
+def test_partition_event_history_moves_stored_events_into_partitions(database, connection):
+    connection.responses["FROM event_detail"] = [[0, 100], [1, 50]]
+    database.partitionEventHistory()
+    commands = [command for command, _ in connection.executed]
+    for table_name in ["event_points", "event_intervals", "event_ranks"]:
+        assert f"CREATE TABLE IF NOT EXISTS {table_name}_s0_e100 PARTITION OF {table_name}_s0 FOR VALUES IN (100);" in commands
+        assert f"CREATE TABLE IF NOT EXISTS {table_name}_s1_e50 PARTITION OF {table_name}_s1 FOR VALUES IN (50);" in commands
+        assert commands.index(f"INSERT INTO {table_name} SELECT * FROM {table_name}_legacy;") \
+             < commands.index(f"DROP TABLE {table_name}_legacy;")
+    assert any(command.startswith("CREATE OR REPLACE TRIGGER event_newDetail") for command in commands)
+
+def test_commit_batch_shares_one_commit(database, connection):
+    writes = [lambda: database.insertEventPoints(0, 100, [[1, 500, 1700000000]]),
+              lambda: database.insertEventPoints(1, 50, [[2, 800, 1700000000]])]
+    assert database._Database__commitBatch(writes) == [None, None]
+    assert len(connection.executed) == 2 and connection.commits == 1
+
+def test_commit_batch_falls_back_to_one_transaction_per_write(database, connection):
+    def fail() -> None: raise ValueError("failed")
+    results = database._Database__commitBatch([lambda: 1, fail, lambda: 3])
+    assert results[0] == 1 and isinstance(results[1], ValueError) and results[2] == 3
+    assert connection.commits == 2 and connection.rollbacks == 2
+
+def test_batch_resolves_each_write_with_its_own_result(database):
+    def fail() -> None: raise ValueError("failed")
+    async def main() -> list:
+        return await asyncio.gather(database.batch(lambda: 1), database.batch(fail), return_exceptions = True)
+    database.batch_window = 0
+    results = asyncio.run(main())
+    assert results[0] == 1 and isinstance(results[1], ValueError)
+
+def test_compact_event_history_cuts_at_the_start_of_an_hour(database, connection):
+    database.compactEventHistory(0, 3600, 7 * 86400)
+    insert, params = next((command, params) for command, params in connection.executed 
+                          if command.startswith("INSERT INTO event_compaction"))
+    assert "AS BIGINT) AS cutoff" in insert and "cutoff - cutoff % 3600" in insert
+    assert "/ 3600 * 3600" not in insert
+    assert params == {"server_id": 0, "raw_retention": 90000, "ended_retention": 7 * 86400}
+    delete = next(command for command, _ in connection.executed if command.startswith("DELETE FROM event_points"))
+    assert "event_points.time < event_compaction.compactedBefore" in delete
+    assert connection.commits == 1
+
+def test_counters_count_stored_and_new_points_alike(database, connection):
+    database.createCountersForPoints()
+    backfill, function = [command for command, _ in connection.executed][:2]
+    assert backfill.startswith("INSERT INTO event_points_hourly") and "FROM event_points LEFT JOIN" in backfill
+    assert function.startswith("CREATE OR REPLACE FUNCTION event_points_newCounts()")
+    upsert = function[function.index("INSERT INTO"):function.index(" RETURN NULL;")]
+    assert upsert == backfill.replace("event_points.", "new_points.").replace("FROM event_points ", "FROM new_points ")
+    assert "time >= COALESCE(compactedBefore, 0)" in upsert
+
+def test_migrations_create_tables_before_their_triggers(database):
+    names = [name for name, _ in database._Database__migrations()]
+    assert names.index("create compaction state") < names.index("create counters for points")
+    assert names.index("create rollup for history") < names.index("create counters for points")
+
+def test_slow_statements_are_explained_once_per_interval(connection, tmp_path):
+    database = Database("localhost", "stare", "stare", "", 5432, slow_query_ms = 1, slow_log_path = tmp_path / "slow.txt")
+    run = connection.run
+    def slowRun(command: str, **params) -> Any:
+        if not command.startswith(("EXPLAIN", "SAVEPOINT", "ROLLBACK", "RELEASE")): time.sleep(0.002)
+        return run(command, **params)
+    connection.run = slowRun
+    for _ in range(3): database.insertEventPoints(0, 100, [[1, 500, 1700000000]])
+    explained = [command for command, _ in connection.executed if command.startswith("EXPLAIN")]
+    assert len(explained) == 1 and explained[0].startswith("EXPLAIN (ANALYZE, BUFFERS) INSERT INTO event_points")
+    assert "insertEventPoints took" in (tmp_path / "slow.txt").read_text()
+
+def test_slow_query_capture_is_off_by_default(database, connection):
+    database.insertEventPoints(0, 100, [[1, 500, 1700000000]])
+    assert not any(command.startswith("EXPLAIN") for command, _ in connection.executed)
@@ -0,0 +1,43 @@
+from utils import http
+from utils.http import CircuitBreaker
+
+def test_circuit_breaker_opens_after_threshold(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(http.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold = 2, backoff = 30)
+    breaker.fail()
+    assert not breaker.isClosed() and breaker.allow()
+    breaker.fail()
+    assert not breaker.allow()
+    now[0] = 129.0
+    assert not breaker.allow()
+
+def test_circuit_breaker_lets_one_probe_through_after_backoff(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(http.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold = 2, backoff = 30)
+    breaker.fail(); breaker.fail()
+    now[0] = 130.0
+    assert breaker.allow()
+    assert not breaker.allow()
+
+def test_circuit_breaker_doubles_backoff_up_to_max(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(http.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold = 1, backoff = 30, max_backoff = 100)
+    breaker.fail()
+    assert breaker.opened_until == 30
+    for expected in [60, 100, 100]:
+        now[0] = breaker.opened_until
+        assert breaker.allow()
+        breaker.fail()
+        assert breaker.opened_until == now[0] + expected
+
+def test_circuit_breaker_resets_on_success(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(http.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold = 1, backoff = 30)
+    breaker.fail(); now[0] = 30.0; breaker.allow(); breaker.fail()
+    breaker.succeed()
+    assert breaker.isClosed() and breaker.allow()
+    assert breaker.next_backoff == 30
@@ -0,0 +1,47 @@
+import urllib.request, urllib.error
+
+import pytest
+
+from utils.metrics import Counter, Histogram, Registry
+
+def test_counter_renders_labelled_values():
+    counter = Counter("requests_total", "Requests", ["source"])
+    counter.inc(source = "game"); counter.inc(2, source = "game"); counter.inc(source = "bestdori")
+    assert counter.render() == [
+        "# HELP requests_total Requests", "# TYPE requests_total counter",
+        "requests_total{source=\"game\"} 3", "requests_total{source=\"bestdori\"} 1"]
+
+def test_counter_escapes_label_values():
+    counter = Counter("errors_total", "Errors", ["reason"])
+    counter.inc(reason = "a \"quoted\"\\path\nline")
+    assert counter.render()[-1] == "errors_total{reason=\"a \\\"quoted\\\"\\\\path\\nline\"} 1"
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("seconds", "Seconds", buckets = (1, 0.1))
+    histogram.observe(0.05); histogram.observe(0.5); histogram.observe(5)
+    assert histogram.render()[2:] == [
+        "seconds_bucket{le=\"0.1\"} 1", "seconds_bucket{le=\"1\"} 2", "seconds_bucket{le=\"+Inf\"} 3",
+        "seconds_sum 5.55", "seconds_count 3"]
+
+def test_histogram_times_failing_blocks():
+    histogram = Histogram("seconds", "Seconds", ["method"])
+    with pytest.raises(ValueError):
+        with histogram.time(method = "select"): raise ValueError("failed")
+    assert histogram.values[("select",)][2] == 1
+
+def test_registry_shares_metrics_by_name():
+    registry = Registry()
+    assert registry.counter("total", "Total") is registry.counter("total", "Total")
+    registry.counter("total", "Total").inc()
+    assert registry.render() == "# HELP total Total\n# TYPE total counter\ntotal 1\n"
+
+def test_registry_serves_metrics():
+    registry = Registry()
+    registry.counter("total", "Total").inc()
+    registry.serve(0)
+    try:
+        port = registry.server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.read().decode("utf-8") == registry.render()
+        with pytest.raises(urllib.error.HTTPError): urllib.request.urlopen(f"http://127.0.0.1:{port}/")
+    finally: registry.server.shutdown(); registry.server.server_close()
@@ -0,0 +1,56 @@
+import asyncio
+
+from utils.scheduler import Scheduler
+
+async def runFor(scheduler: Scheduler, seconds: float) -> None:
+    task = asyncio.create_task(scheduler.run())
+    await asyncio.sleep(seconds); task.cancel()
+    try: await task
+    except asyncio.CancelledError: pass
+
+def test_scheduler_runs_jobs_by_deadline():
+    runs = []
+    async def main():
+        scheduler = Scheduler()
+        async def job(name): runs.append(name)
+        scheduler.add("late", lambda: job("late"), lambda: None, delay = 0.02)
+        scheduler.add("early", lambda: job("early"), lambda: None, delay = 0.01)
+        await runFor(scheduler, 0.05)
+    asyncio.run(main())
+    assert runs == ["early", "late"]
+
+def test_scheduler_reschedules_by_cadence_and_pauses_on_none():
+    runs = []
+    async def main():
+        scheduler = Scheduler()
+        async def job(): runs.append(1)
+        scheduler.add("job", job, lambda: 0.01 if len(runs) < 3 else None)
+        await runFor(scheduler, 0.1)
+    asyncio.run(main())
+    assert len(runs) == 3
+
+def test_scheduler_wakes_paused_job():
+    runs = []
+    async def main():
+        scheduler = Scheduler()
+        async def job(): runs.append(1)
+        scheduler.add("job", job, lambda: None, delay = 10)
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.01); scheduler.wake("job"); await asyncio.sleep(0.02)
+        task.cancel()
+        try: await task
+        except asyncio.CancelledError: pass
+    asyncio.run(main())
+    assert len(runs) == 1
+
+def test_scheduler_keeps_running_after_failed_job():
+    runs = []
+    async def main():
+        scheduler = Scheduler()
+        async def failing(): raise ValueError("failed")
+        async def job(): runs.append(1)
+        scheduler.add("failing", failing, lambda: None)
+        scheduler.add("job", job, lambda: None, delay = 0.01)
+        await runFor(scheduler, 0.05)
+    asyncio.run(main())
+    assert runs == [1]
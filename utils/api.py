@@ -1,11 +1,15 @@
-import requests, json, asyncio, time, traceback
+import json, asyncio, time, hashlib, re, traceback
 from datetime import datetime
 from pathlib import Path
 from environs import Env
+from typing import Optional, Union
 from logging import Logger
 
 from utils.logger import getLogger, logExceptionToFile
 from utils.db_pg import Database
+from utils.http import HTTPClient, Response, CircuitBreaker
+from utils.scheduler import Scheduler
+from utils.metrics import REGISTRY, FETCH_SECONDS, PARSE_SECONDS, INGEST_SECONDS, UPSTREAM_ERRORS, BESTDORI_FALLBACKS
 from objs.activity import EVENT_TYPE, EventInfo, getRecentEvent, MonthlyInfo, getRecentMonthly
 
 PACKAGE_URL = [
@@ -15,16 +19,23 @@ PACKAGE_URL = [
     "https://itunes.apple.com/cn/lookup?bundleId=com.bilibili.star"
 ]
 
+# Returned instead of data when the upstream body is the same as the last stored one
+NOT_MODIFIED = object()
+
 class API:
-    def __init__(self, server_id: int, env_file_path: Path, log_base_path: Path):
+    def __init__(self, server_id: int, env_file_path: Path, log_base_path: Path, 
+                 database: Optional[Database] = None, http: Optional[HTTPClient] = None):
         self.logger: Logger = getLogger(f"{__name__}.{server_id}")
         self.log_file_path: Path = log_base_path / f"{__name__}.{server_id}.txt"
         self.server_id: int = server_id
         
         env = Env(); env.read_env(env_file_path)
-        self.database: Database = Database(
+        self.database: Database = database if database != None else Database(
             host = env.str("DB_HOST"), name = env.str("DB_NAME"), user = env.str("DB_USER"), 
-            password = env.str("DB_PASSWORD"), port = env.int("DB_PORT"), logger = self.logger)
+            password = env.str("DB_PASSWORD"), port = env.int("DB_PORT"), logger = self.logger, 
+            slow_query_ms = env.int("DB_SLOW_QUERY_MS", 0), slow_log_path = log_base_path / f"database.slow.{server_id}.txt")
+        self.raw_retention: int = env.int("RAW_RETENTION_HOURS", 48) * 3600
+        self.ended_retention: int = env.int("ENDED_RETENTION_DAYS", 7) * 86400
         
         try: 
             from utils.parser import Parser
@@ -38,145 +49,266 @@ class API:
             if self.server_id != 3: self.parser = None if kiv == ["-"] else Parser(kiv[0], kiv[1], self.logger)
             else: self.parser = None if kiv == ["-"] or rid == "-" else Parser(kiv[0], kiv[1], self.logger, rid)
         except: self.parser = None
-        self.version = None; self.__checkGameVersion()
-        if self.parser != None: 
-            self.unavailability: int = 0; self.__checkStatusOfGame(); self.logger.info("Game connected")
+        self.version = None; self.is_own_http: bool = http == None
+        self.http: HTTPClient = HTTPClient() if http == None else http
+        self.validators: dict[str, tuple[Optional[str], Optional[str], str]] = {}
+        self.unconfirmed: dict[str, tuple[Optional[str], Optional[str], str]] = {}
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.last_seen: dict[tuple[str, int], tuple[dict[int, tuple], dict[int, int]]] = {}
+        self.writes: dict[str, int] = {"event": 0, "monthly": 0}
+        self.backoffs: dict[str, float] = {"event": 1, "monthly": 1}
+        self.recent_event: Optional[EventInfo] = None; self.recent_monthly: Optional[MonthlyInfo] = None
+        self.flag: bool = False
         
-        asyncio.run(self.__monitor())
+        # Running on its own as the target of a process, with metrics on a port after the one of the bot,
+        # otherwise Leaving the monitor and metrics to the shared event loop
+        if database == None: 
+            metrics_port = env.int("METRICS_PORT", 0)
+            if metrics_port != 0: REGISTRY.serve(metrics_port + 1 + self.server_id)
+            asyncio.run(self.monitor())
     
     # %% Getting and Parsing data from http response
-    def __getDataFromBestdori(self, url: str) -> dict:
-        try: response = requests.get(url, timeout = 4)
-        except: logExceptionToFile(self.log_file_path, "Fail to get response from Bestdori", 
-                                   traceback.format_exc()); return None
-        try: return json.loads(response.text)
-        except: logExceptionToFile(self.log_file_path, "Fail to load response from Bestdori", 
-                                   traceback.format_exc(), {"response": response}); return None
+    async def __request(self, url: str, headers: Optional[dict[str, str]] = None, timeout: Optional[float] = 4, 
+                        conditional: Optional[bool] = False) -> Optional[Response]:
+        # Asking only for a changed body where the upstream supports it, and Treating a body with the same hash
+        # as the last stored one as unchanged, both of which give None
+        if not conditional: return await self.http.get(url, headers = headers, timeout = timeout)
+        etag, last_modified, digest = self.validators.get(url, (None, None, None))
+        headers = {} if headers == None else dict(headers)
+        if etag != None: headers["If-None-Match"] = etag
+        if last_modified != None: headers["If-Modified-Since"] = last_modified
+        response = await self.http.get(url, headers = headers, timeout = timeout)
+        if response.status_code == 304: return None
+        new_digest = hashlib.sha1(response.content).hexdigest()
+        if new_digest == digest: return None
+        self.unconfirmed[url] = (response.headers.get("ETag", None), response.headers.get("Last-Modified", None), new_digest)
+        return response
+    
+    def __confirm(self, url: str) -> None:
+        # Keeping the validators only once the body is stored, so a failed write fetches it in full again
+        if url in self.unconfirmed: self.validators[url] = self.unconfirmed.pop(url)
+        return
+    
+    async def __getDataFromBestdori(self, url: str, timeout: Optional[float] = 4, 
+                                    conditional: Optional[bool] = False) -> dict:
+        try: 
+            with FETCH_SECONDS.time(source = "bestdori"): 
+                response = await self.__request(url, timeout = timeout, conditional = conditional)
+        except: 
+            UPSTREAM_ERRORS.inc(source = "bestdori")
+            logExceptionToFile(self.log_file_path, "Fail to get response from Bestdori", 
+                               traceback.format_exc()); return None
+        if response == None: return NOT_MODIFIED
+        try: 
+            with PARSE_SECONDS.time(source = "bestdori"): return json.loads(response.text)
+        except: 
+            UPSTREAM_ERRORS.inc(source = "bestdori")
+            logExceptionToFile(self.log_file_path, "Fail to load response from Bestdori", 
+                               traceback.format_exc(), {"response": response}); return None
         
-    def __getDataFromGame(self, url: str) -> list:
-        try: return self.parser.parse(requests.get(url, headers = self.parser.set(self), timeout = 2))
+    def __breaker(self, url: str) -> CircuitBreaker:
+        # Sharing one breaker among the urls of an endpoint, which only differ in ids
+        return self.breakers.setdefault(re.sub(r"\d+", "*", url), CircuitBreaker())
+    
+    def __isGameAvailable(self, url: str) -> bool:
+        return self.unavailability < 3 and self.__breaker(url).allow()
+    
+    async def __getDataFromGame(self, url: str, conditional: Optional[bool] = False) -> list:
+        # Retrying with a longer timeout only while the endpoint is healthy, so a failing one costs a single attempt
+        breaker = self.__breaker(url); is_retryable = breaker.isClosed()
+        try: 
+            with FETCH_SECONDS.time(source = "game"): 
+                response = await self.__request(url, self.parser.set(self), 2, conditional)
+            with PARSE_SECONDS.time(source = "game"): 
+                data = NOT_MODIFIED if response == None else self.parser.parse(response)
+            breaker.succeed(); return data
         except: 
-            try: response = requests.get(url, headers = self.parser.set(self), timeout = 8)
-            except: logExceptionToFile(self.log_file_path, "Fail to get response from Game", 
-                                       traceback.format_exc()); return None
-            try: return self.parser.parse(response)
-            except: logExceptionToFile(self.log_file_path, "Fail to load response from Game", 
-                                       traceback.format_exc(), {"response": response}); return None
+            UPSTREAM_ERRORS.inc(source = "game")
+            if not is_retryable: 
+                breaker.fail(); logExceptionToFile(self.log_file_path, "Fail to get response from Game", 
+                                                   traceback.format_exc()); return None
+            try: 
+                with FETCH_SECONDS.time(source = "game"): 
+                    response = await self.__request(url, self.parser.set(self), 8, conditional)
+            except: 
+                UPSTREAM_ERRORS.inc(source = "game")
+                breaker.fail(); logExceptionToFile(self.log_file_path, "Fail to get response from Game", 
+                                                   traceback.format_exc()); return None
+            if response == None: breaker.succeed(); return NOT_MODIFIED
+            try: 
+                with PARSE_SECONDS.time(source = "game"): data = self.parser.parse(response)
+                breaker.succeed(); return data
+            except: 
+                UPSTREAM_ERRORS.inc(source = "game")
+                breaker.fail(); logExceptionToFile(self.log_file_path, "Fail to load response from Game", 
+                                                   traceback.format_exc(), {"response": response}); return None
+    
+    # %% Writing only the changes of snapshots
+    def __diffSnapshot(self, activity: tuple[str, int], players: list[list], 
+                       points: list[list]) -> tuple[list[list], list[int], list[list]]:
+        # Comparing with the last snapshot written for the activity, where state of older activities is dropped
+        if activity not in self.last_seen:
+            for key in [key for key in self.last_seen.keys() if key[0] == activity[0]]: self.last_seen.pop(key)
+        seen_players, seen_points = self.last_seen.get(activity, ({}, {}))
+        changed_players = [player for player in players if seen_players.get(player[0], None) != tuple(player[1:])]
+        new_uids = [player[0] for player in changed_players if player[0] not in seen_players]
+        new_points = [point for point in points if point[1] > seen_points.get(point[0], -1)]
+        return changed_players, new_uids, new_points
+    
+    def __markSnapshot(self, activity: tuple[str, int], players: list[list], points: list[list]) -> None:
+        # Remembering the rows only after they are committed, so a failed write is resent on the next tick
+        seen_players, seen_points = self.last_seen.setdefault(activity, ({}, {}))
+        for player in players: seen_players[player[0]] = tuple(player[1:])
+        for uid, value, _ in points: seen_points[uid] = max(value, seen_points.get(uid, -1))
+        self.writes[activity[0]] += 1; return
+    
+    async def __storeEventSnapshot(self, event: EventInfo, players: list[list], points: list[list]) -> None:
+        players, new_uids, points = self.__diffSnapshot(("event", event.id), players, points)
+        if players == [] and points == []: return
+        with INGEST_SECONDS.time(kind = "event"):
+            await self.database.batch(self.database.insertEventSnapshot, 
+                                      self.server_id, event.id, players, points, event.start_at, new_uids)
+        self.__markSnapshot(("event", event.id), players, points); return
+    
+    async def __storeMonthlySnapshot(self, monthly: MonthlyInfo, players: list[list], points: list[list]) -> None:
+        players, _, points = self.__diffSnapshot(("monthly", monthly.id), players, points)
+        if players == [] and points == []: return
+        with INGEST_SECONDS.time(kind = "monthly"):
+            await self.database.batch(self.database.insertMonthlySnapshot, 
+                                      self.server_id, monthly.id, players, points, monthly.start_at)
+        self.__markSnapshot(("monthly", monthly.id), players, points); return
+    
+    def __insertEventDetails(self, events: list[list]) -> None:
+        # Running on the database executor, so the transaction stays on one thread
+        with self.database.transaction():
+            for event in events: self.database.insertEventDetail(self.server_id, *event)
+        return
+    
+    def __insertMonthlyDetails(self, monthlys: list[list]) -> None:
+        with self.database.transaction():
+            for monthly in monthlys: self.database.insertMonthlyDetail(self.server_id, *monthly)
+        return
     
     # %% Fetching and Storing data to database
-    def __fetchRecentEvents(self) -> bool:
+    async def __fetchRecentEvents(self) -> bool:
         try:
-            if self.parser != None and self.unavailability < 3:
-                recent_events: list = self.__getDataFromGame(self.url_base + "event")
-                for event in recent_events:
-                        if isinstance(event, list):
-                            self.database.insertEventDetail(
-                                self.server_id, event[0], event[2], EVENT_TYPE[event[1]], 
-                                int(event[4] / 1000), int(event[5] / 1000))
+            if self.parser != None and self.__isGameAvailable(self.url_base + "event"):
+                recent_events: list = await self.__getDataFromGame(self.url_base + "event")
+                await self.database.run(self.__insertEventDetails, [
+                    [event[0], event[2], EVENT_TYPE[event[1]], int(event[4] / 1000), int(event[5] / 1000)]
+                    for event in recent_events if isinstance(event, list)])
                 return True
         except: self.logger.warning("Fail to get recent events from Game")
+        if self.parser != None: BESTDORI_FALLBACKS.inc(kind = "recent events")
         try: 
             recent_events: dict[str, dict[str, dict[str, list]]] \
-                = self.__getDataFromBestdori("https://bestdori.com/api/news/dynamic/recent.json")
+                = await self.__getDataFromBestdori("https://bestdori.com/api/news/dynamic/recent.json")
+            
+            # Fetching details only of events whose schedule on this server is not the stored one, or is not listed,
+            # together with a bounded fan-out to Bestdori, while events not held on this server yet are skipped
+            semaphore = asyncio.Semaphore(4)
+            async def getEvent(event_id: int) -> dict:
+                async with semaphore: 
+                    return await self.__getDataFromBestdori(f"https://bestdori.com/api/events/{event_id}.json", timeout = 2)
+            stored = {event_id: (start_at, end_at) for event_id, start_at, end_at in await self.database.run(
+                self.database.selectEventSchedules, self.server_id, [int(event_id) for event_id in recent_events["events"].keys()])}
+            event_ids = []
             for event_id, event in recent_events["events"].items():
-                event = json.loads(requests.get(f"https://bestdori.com/api/events/{event_id}.json"
-                                                , timeout = 2).text)
-                if event["startAt"][self.server_id] != None:
-                    self.database.insertEventDetail(
-                        self.server_id, event_id, event["eventName"][self.server_id], EVENT_TYPE[event["eventType"]], 
-                        int(int(event["startAt"][self.server_id]) / 1000), int(int(event["endAt"][self.server_id]) / 1000))
+                start_at, end_at = event.get("startAt", None), event.get("endAt", None)
+                if start_at != None and end_at != None:
+                    if start_at[self.server_id] == None or end_at[self.server_id] == None: continue
+                    if stored.get(int(event_id), None) == (int(int(start_at[self.server_id]) / 1000), 
+                                                           int(int(end_at[self.server_id]) / 1000)): continue
+                event_ids.append(int(event_id))
+            events = await asyncio.gather(*[getEvent(event_id) for event_id in event_ids])
+            details = [[event_id, event["eventName"][self.server_id], EVENT_TYPE[event["eventType"]], 
+                        int(int(event["startAt"][self.server_id]) / 1000), int(int(event["endAt"][self.server_id]) / 1000)]
+                       for event_id, event in zip(event_ids, events) 
+                       if event != None and event["startAt"][self.server_id] != None]
+            await self.database.run(self.__insertEventDetails, details)
             return True
         except: self.logger.warning("Fail to get recent events from Bestdori")
         return False
         
-    def __fetchEventTop(self, event: EventInfo) -> bool:
+    async def __fetchEventTop(self, event: EventInfo) -> bool:
         try:
-            if self.parser != None and self.unavailability < 3:
+            url = None if self.parser == None else self.url_base + f"user/{self.uid}/event/{event.id}/{event.type}/ranking"
+            if self.parser != None and self.__isGameAvailable(url):
                 fetch_time = int(datetime.now().timestamp())
-                event_tops: list = self.__getDataFromGame(
-                    self.url_base + f"user/{self.uid}/event/{event.id}/{event.type}/ranking")[0]
-                self.database.insertEventPlayers(
-                    self.server_id, event.id, [[event_top[6], event_top[0], event_top[3], event_top[2]] 
-                                            for event_top in event_tops], event.start_at)
-                self.database.insertDefaultEventRanks(
-                    self.server_id, event.id, [event_top[6] for event_top in event_tops], event.start_at)
-                self.database.insertEventPoints(
-                    self.server_id, event.id, [[event_top[6], event_top[5], fetch_time] for event_top in event_tops])
-                return True
+                event_tops: list = await self.__getDataFromGame(url, conditional = True)
+                if event_tops is NOT_MODIFIED: return True
+                await self.__storeEventSnapshot(
+                    event, [[event_top[6], event_top[0], event_top[3], event_top[2]] for event_top in event_tops[0]], 
+                    [[event_top[6], event_top[5], fetch_time] for event_top in event_tops[0]])
+                self.__confirm(url); return True
         except: self.logger.warning(f"Fail to get top of event {event.id} from Game")
+        if self.parser != None: BESTDORI_FALLBACKS.inc(kind = "event top")
         try:
-            event_tops: dict[str, list[dict[str]]] = self.__getDataFromBestdori(
-                f"https://bestdori.com/api/eventtop/data?server={self.server_id}&event={event.id}&mid=0&interval=864000000")
-            self.database.insertEventPlayers(
-                self.server_id, event.id, [[event_top["uid"], event_top["name"], event_top["introduction"], 
-                                            event_top["rank"]] for event_top in event_tops["users"]], event.start_at)
-            self.database.insertDefaultEventRanks(
-                self.server_id, event.id, [event_top["uid"] for event_top in event_tops["users"]], event.start_at)
-            self.database.insertEventPoints(
-                self.server_id, event.id, [[event_top["uid"], event_top["value"], int(event_top["time"] / 1000)] 
-                                           for event_top in event_tops["points"]])
-            return True
+            url = f"https://bestdori.com/api/eventtop/data?server={self.server_id}&event={event.id}&mid=0&interval=864000000"
+            event_tops: dict[str, list[dict[str]]] = await self.__getDataFromBestdori(url, conditional = True)
+            if event_tops is NOT_MODIFIED: return True
+            await self.__storeEventSnapshot(
+                event, [[event_top["uid"], event_top["name"], event_top["introduction"], event_top["rank"]] 
+                        for event_top in event_tops["users"]], 
+                [[event_top["uid"], event_top["value"], int(event_top["time"] / 1000)] 
+                 for event_top in event_tops["points"]])
+            self.__confirm(url); return True
         except: self.logger.warning(f"Fail to get top of event {event.id} from Bestdori")
         return False
     
-    def __fetchFullEventTop(self, event: EventInfo) -> bool:
+    async def __fetchFullEventTop(self, event: EventInfo) -> bool:
         try:
-            event_tops: dict[str, list[dict[str]]] = self.__getDataFromBestdori(
+            event_tops: dict[str, list[dict[str]]] = await self.__getDataFromBestdori(
                 f"https://bestdori.com/api/eventtop/data?server={self.server_id}&event={event.id}&mid=0&interval=60000")
-            self.database.insertEventPlayers(
-                self.server_id, event.id, [[event_top["uid"], event_top["name"], event_top["introduction"], 
-                                            event_top["rank"]] for event_top in event_tops["users"]], event.start_at)
-            self.database.insertDefaultEventRanks(
-                self.server_id, event.id, [event_top["uid"] for event_top in event_tops["users"]], event.start_at)
-            self.database.insertEventPoints(
-                self.server_id, event.id, [[event_top["uid"], event_top["value"], int(event_top["time"] / 1000)] 
-                                           for event_top in event_tops["points"]])
+            await self.__storeEventSnapshot(
+                event, [[event_top["uid"], event_top["name"], event_top["introduction"], event_top["rank"]] 
+                        for event_top in event_tops["users"]], 
+                [[event_top["uid"], event_top["value"], int(event_top["time"] / 1000)] 
+                 for event_top in event_tops["points"]])
             return True
         except: self.logger.warning(f"Fail to get full top of event {event.id} from Bestdori")
         return False
     
-    def __fetchRecentMonthlys(self) -> bool:
+    async def __fetchRecentMonthlys(self) -> bool:
         try:
-            if self.parser != None and self.unavailability < 3:
-                recent_monthlys: list = self.__getDataFromGame(self.url_base + "monthlyranking")
-                for monthly in recent_monthlys:
-                    if isinstance(monthly, list):
-                        self.database.insertMonthlyDetail(
-                            self.server_id, monthly[0], monthly[1], int(monthly[5] / 1000), int(monthly[6] / 1000))
+            if self.parser != None and self.__isGameAvailable(self.url_base + "monthlyranking"):
+                recent_monthlys: list = await self.__getDataFromGame(self.url_base + "monthlyranking")
+                await self.database.run(self.__insertMonthlyDetails, [
+                    [monthly[0], monthly[1], int(monthly[5] / 1000), int(monthly[6] / 1000)]
+                    for monthly in recent_monthlys if isinstance(monthly, list)])
                 return True
         except: self.logger.warning("Fail to get recent monthlys from Game")
         return False
         
-    def __fetchMonthlyTop(self, monthly: MonthlyInfo) -> bool:
+    async def __fetchMonthlyTop(self, monthly: MonthlyInfo) -> bool:
         try:
-            if self.parser != None and self.unavailability < 3:
+            url = None if self.parser == None else self.url_base + f"user/{self.uid}/monthlyranking/{monthly.id}/ranking"
+            if self.parser != None and self.__isGameAvailable(url):
                 fetch_time = int(datetime.now().timestamp())
-                monthly_tops: list = self.__getDataFromGame(
-                    self.url_base + f"user/{self.uid}/monthlyranking/{monthly.id}/ranking")[0]
-                self.database.insertMonthlyPlayers(
-                    self.server_id, monthly.id, [[monthly_top[6], monthly_top[0], monthly_top[3], monthly_top[2]] 
-                                            for monthly_top in monthly_tops], monthly.start_at)
-                self.database.insertMonthlyPoints(
-                    self.server_id, monthly.id, [[monthly_top[6], monthly_top[5], fetch_time] 
-                                                for monthly_top in monthly_tops])
-                return True
+                monthly_tops: list = await self.__getDataFromGame(url, conditional = True)
+                if monthly_tops is NOT_MODIFIED: return True
+                await self.__storeMonthlySnapshot(
+                    monthly, [[monthly_top[6], monthly_top[0], monthly_top[3], monthly_top[2]] 
+                              for monthly_top in monthly_tops[0]], 
+                    [[monthly_top[6], monthly_top[5], fetch_time] for monthly_top in monthly_tops[0]])
+                self.__confirm(url); return True
         except: self.logger.warning(f"Fail to get top of monthly {monthly.id} from Game")
         return False
     
     # %% Monitoring data regularly
-    def __checkGameVersion(self) -> None:
+    async def __checkGameVersion(self) -> None:
         try:
-            response = requests.get(PACKAGE_URL[self.server_id], timeout = 2)
+            response = await self.http.get(PACKAGE_URL[self.server_id], timeout = 2)
             self.version = json.loads(response.text)["results"][0]["version"]
             
-            response = requests.get(self.url_base + "application", headers = self.parser.set(self), timeout = 2)
+            response = await self.http.get(self.url_base + "application", headers = self.parser.set(self), timeout = 2)
             if response.status_code == 412: self.version = self.version[:-1] + str(int(self.version[-1]) - 1)
         except: logExceptionToFile(self.log_file_path, "Fail to check game version", traceback.format_exc()); return
     
-    def __checkStatusOfGame(self) -> None: 
+    async def __checkStatusOfGame(self) -> None: 
         try:
-            status = self.parser.parse(requests.get(self.url_base + "application", 
-                                                    headers = self.parser.set(self), timeout = 2))
+            status = self.parser.parse(await self.http.get(self.url_base + "application", 
+                                                           headers = self.parser.set(self), timeout = 2))
             if status[2] == "available":
                 if self.unavailability > 3:
                     self.logger.error(f"Connection to game was down for {self.unavailability} min(s)")
@@ -186,24 +318,76 @@ class API:
             self.unavailability += 1
         return
     
-    async def __monitor(self) -> None:
-        flag = False; s_time = time.time()
-        while True:
-            self.__fetchRecentEvents(); recent_event = getRecentEvent(self.database, self.server_id)
-            self.__fetchRecentMonthlys(); recent_monthly = getRecentMonthly(self.database, self.server_id)
-            
-            for _ in range(60):
-                await asyncio.sleep(max(0, 15 - time.time() + s_time)); s_time = time.time()
-                if datetime.now().timestamp() >= recent_event.start_at:
-                    if flag == False: flag = self.__fetchFullEventTop(recent_event)
-                    else: flag = self.__fetchEventTop(recent_event)
-                
-                await asyncio.sleep(max(0, 15 - time.time() + s_time)); s_time = time.time()
-                if recent_monthly != None and datetime.now().timestamp() >= recent_monthly.start_at: 
-                    self.__fetchMonthlyTop(recent_monthly)
-                
-                await asyncio.sleep(max(0, 15 - time.time() + s_time)); s_time = time.time()
-                if self.parser != None: self.__checkGameVersion()
-                
-                await asyncio.sleep(max(0, 15 - time.time() + s_time)); s_time = time.time()
-                if self.parser != None: self.__checkStatusOfGame()
\ No newline at end of file
+    async def monitor(self) -> None:
+        try: await self.__run()
+        finally: 
+            if self.is_own_http: await self.http.close()
+    
+    # %% Scheduling jobs by activity phase, change rate and upstream health
+    def __adapt(self, kind: str, is_success: bool, is_changed: bool) -> None:
+        # Backing off while the ranking stays still or the upstream fails, and Resetting once it moves
+        if not is_success: self.backoffs[kind] = min(self.backoffs[kind] * 2, 5)
+        elif not is_changed: self.backoffs[kind] = min(self.backoffs[kind] * 1.5, 3)
+        else: self.backoffs[kind] = 1
+        return
+    
+    def __activityCadence(self, kind: str, activity: Optional[Union[EventInfo, MonthlyInfo]]) -> Optional[float]:
+        # Waiting for the start, Polling faster in the last 3 hours, and Pausing 30 minutes after the end
+        now = time.time()
+        if activity == None or now > activity.end_at + 1800: return None
+        if now < activity.start_at: return activity.start_at - now
+        return min((30 if activity.end_at - now <= 10800 else 60) * self.backoffs[kind], 300)
+    
+    async def __pollRecentActivities(self) -> None:
+        await self.__fetchRecentEvents()
+        recent_event = await self.database.run(getRecentEvent, self.database, self.server_id)
+        await self.__fetchRecentMonthlys()
+        recent_monthly = await self.database.run(getRecentMonthly, self.database, self.server_id)
+        if recent_event != None and (self.recent_event == None or recent_event.id != self.recent_event.id): 
+            self.flag = False; self.backoffs["event"] = 1; self.scheduler.wake("event top")
+        if recent_monthly != None and (self.recent_monthly == None or recent_monthly.id != self.recent_monthly.id): 
+            self.backoffs["monthly"] = 1; self.scheduler.wake("monthly top")
+        self.recent_event = recent_event; self.recent_monthly = recent_monthly; return
+    
+    def __recentActivitiesCadence(self) -> float:
+        # Looking for the next event more often while none is running
+        if self.recent_event == None or time.time() > self.recent_event.end_at: return 900
+        return 3600
+    
+    async def __pollEventTop(self) -> None:
+        if self.recent_event == None or time.time() < self.recent_event.start_at: return
+        writes = self.writes["event"]
+        # Fetching the full history again on the next tick after any failed fetch, as points may have been missed
+        if self.flag == False: is_success = await self.__fetchFullEventTop(self.recent_event)
+        else: is_success = await self.__fetchEventTop(self.recent_event)
+        self.flag = is_success; self.__adapt("event", is_success, self.writes["event"] != writes); return
+    
+    async def __pollMonthlyTop(self) -> None:
+        if self.recent_monthly == None or time.time() < self.recent_monthly.start_at: return
+        writes = self.writes["monthly"]
+        is_success = await self.__fetchMonthlyTop(self.recent_monthly)
+        self.__adapt("monthly", is_success, self.writes["monthly"] != writes); return
+    
+    async def __compactHistory(self) -> None:
+        await self.database.run(self.database.compactEventHistory, self.server_id, 
+                                self.raw_retention, self.ended_retention)
+        return
+    
+    async def __run(self) -> None:
+        await self.__checkGameVersion()
+        if self.parser != None: 
+            self.unavailability: int = 0; await self.__checkStatusOfGame(); self.logger.info("Game connected")
+        
+        self.scheduler: Scheduler = Scheduler(self.logger)
+        self.scheduler.add("recent activities", self.__pollRecentActivities, self.__recentActivitiesCadence)
+        self.scheduler.add("event top", self.__pollEventTop, 
+                           lambda: self.__activityCadence("event", self.recent_event), delay = 1)
+        self.scheduler.add("monthly top", self.__pollMonthlyTop, 
+                           lambda: self.__activityCadence("monthly", self.recent_monthly), delay = 2)
+        self.scheduler.add("compact history", self.__compactHistory, lambda: 3600, delay = 300)
+        if self.parser != None:
+            # Checking the version more often while the game is unavailable, as an update is the usual cause
+            self.scheduler.add("game version", self.__checkGameVersion, 
+                               lambda: 60 if self.unavailability > 0 else 600, delay = 60)
+            self.scheduler.add("game status", self.__checkStatusOfGame, lambda: 60, delay = 60)
+        await self.scheduler.run()
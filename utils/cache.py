@@ -0,0 +1,97 @@
+import time, asyncio, threading
+from collections import OrderedDict
+from typing import Optional, Callable, Awaitable, Any
+
+class TTLCache:
+    def __init__(self, max_size: Optional[int] = 4096, ttl: Optional[int] = 300):
+        # Keeping at most max size entries in least recently used order, each expiring after ttl seconds,
+        # where the lock makes it safe to share among the threads of the database executor
+        self.max_size: int = max_size
+        self.ttl: int = ttl
+        self.entries: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self.versions: OrderedDict[tuple, int] = OrderedDict()
+        self.lock: threading.Lock = threading.Lock()
+
+    def get(self, key: tuple) -> Any:
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry == None: return None
+            if time.monotonic() - entry[0] > self.ttl: self.entries.pop(key); return None
+            self.entries.move_to_end(key); return entry[1]
+
+    def version(self, key: tuple) -> int:
+        with self.lock: return self.versions.get(key, 0)
+
+    def set(self, key: tuple, value: Any, version: Optional[int] = None) -> None:
+        # Rejecting a value read before the key was invalidated, when given the version taken before reading
+        with self.lock:
+            if version != None and self.versions.get(key, 0) != version: return
+            self.entries[key] = (time.monotonic(), value); self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size: self.entries.popitem(last = False)
+        return
+
+    def invalidate(self, key: tuple) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+            self.versions[key] = self.versions.get(key, 0) + 1; self.versions.move_to_end(key)
+            while len(self.versions) > self.max_size: self.versions.popitem(last = False)
+        return
+
+class SnapshotCache:
+    def __init__(self, max_age: Optional[int] = 90):
+        # Keeping computed results per activity scope and the snapshot time they were computed with,
+        # where max age is the fallback for notifications which are lost
+        self.max_age: int = max_age
+        self.snapshots: dict[tuple, Optional[int]] = {}
+        self.entries: dict[tuple, tuple[float, Any]] = {}
+        self.pendings: dict[tuple, asyncio.Future] = {}
+
+    def __key(self, scope: tuple, key: tuple) -> tuple:
+        return scope + (self.snapshots.get(scope, None),) + key
+
+    def get(self, scope: tuple, key: tuple) -> Any:
+        full_key = self.__key(scope, key); entry = self.entries.get(full_key, None)
+        if entry == None: return None
+        if time.monotonic() - entry[0] > self.max_age: self.entries.pop(full_key); return None
+        return entry[1]
+
+    def set(self, scope: tuple, key: tuple, value: Any) -> None:
+        self.__store(self.__key(scope, key), value); return
+
+    def __store(self, full_key: tuple, value: Any) -> None:
+        # Dropping every expired result along the way, as scopes no longer requested are never invalidated
+        now = time.monotonic()
+        for key in [key for key, entry in self.entries.items() if now - entry[0] > self.max_age]: self.entries.pop(key)
+        self.entries[full_key] = (now, value); return
+
+    async def fetch(self, scope: tuple, key: tuple, compute: Callable[[], Awaitable]) -> Any:
+        # Serving from memory, or sharing one computation among identical requests arriving together,
+        # where the waiters compute it again themselves if the request computing it is cancelled
+        value = self.get(scope, key)
+        if value != None: return value
+        full_key = self.__key(scope, key)
+        if full_key in self.pendings:
+            pending = self.pendings[full_key]
+            try: return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled(): raise
+                return await self.fetch(scope, key, compute)
+        pending = asyncio.get_running_loop().create_future(); self.pendings[full_key] = pending
+        try: value = await compute()
+        except asyncio.CancelledError: self.pendings.pop(full_key); pending.cancel(); raise
+        except Exception as exception:
+            # Marking the exception as retrieved, as there may be no waiter to receive it
+            self.pendings.pop(full_key); pending.set_exception(exception); pending.exception(); raise
+        self.__store(full_key, value)
+        self.pendings.pop(full_key); pending.set_result(value); return value
+
+    def invalidate(self, scope: tuple, snapshot_time: Optional[int] = None) -> None:
+        # Moving the scope to the new snapshot and Dropping results computed with older ones
+        self.snapshots[scope] = snapshot_time
+        for key in [key for key in self.entries.keys() if key[:len(scope)] == scope]: self.entries.pop(key)
+        return
+
+    def onSnapshot(self, channel: str, payload: str) -> None:
+        # Parsing the payload "<kind>:<server id>:<activity id>:<snapshot time>" sent by the collector
+        kind, server_id, activity_id, snapshot_time = payload.split(":")
+        self.invalidate((kind, int(server_id), int(activity_id)), int(snapshot_time)); return
@@ -1,24 +1,193 @@
-import pg8000
-from typing import Optional
+import pg8000, asyncio, threading, logging, time
+from logging.handlers import RotatingFileHandler
+from functools import partial
+from pathlib import Path
+from queue import LifoQueue, Empty
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union, Callable, Iterable, Iterator, Any
 from logging import Logger
 
+from utils.cache import TTLCache
+from utils.metrics import QUERY_SECONDS, STATEMENT_SECONDS
+
+BULK_THRESHOLD = 1000
+EXPLAIN_INTERVAL = 300
+
 class Database:
-    def __init__(self, host: str, name: str, user: str, password: str, port: int, logger: Optional[Logger] = None):
-        self.connection = pg8000.connect(
-            host = host,
-            database = name,
-            user = user,
-            password = password,
-            port = port
-        ); self.logger = logger
+    def __init__(self, host: str, name: str, user: str, password: str, port: int, 
+                 logger: Optional[Logger] = None, pool_size: Optional[int] = 1, 
+                 slow_query_ms: Optional[int] = 0, slow_log_path: Optional[Path] = None, 
+                 batch_window: Optional[float] = 0.05):
+        self.config: dict[str, Any] = {"host": host, "database": name, "user": user, "password": password, "port": port}
+        self.logger = logger; self.pool_size: int = max(1, pool_size)
+        
+        # Setting up the rotating log of plans of statements slower than the threshold, which is off with 0,
+        # as capturing a plan executes the statement once more inside the transaction of the caller
+        self.slow_query_ms: int = slow_query_ms if slow_log_path != None else 0
+        self.slow_logger: Optional[Logger] = None
+        self.__explained: dict[str, float] = {}
+        if self.slow_query_ms > 0:
+            slow_log_path.parent.mkdir(parents = True, exist_ok = True)
+            self.slow_logger = logging.getLogger(f"slow.{slow_log_path}"); self.slow_logger.propagate = False
+            if self.slow_logger.handlers == []:
+                handler = RotatingFileHandler(slow_log_path, maxBytes = 1 << 20, backupCount = 5, encoding = "utf-8")
+                handler.setFormatter(logging.Formatter("[{asctime}] {message}", "%Y-%m-%d %H:%M:%S", style = "{"))
+                self.slow_logger.addHandler(handler)
+        
+        # Setting up a bounded pool whose slots are connected lazily, except the first one to fail fast
+        self.__pool: LifoQueue = LifoQueue(maxsize = self.pool_size)
+        for _ in range(self.pool_size - 1): self.__pool.put(None)
+        self.__pool.put(pg8000.connect(**self.config))
+        self.__statements: dict[pg8000.Connection, dict[str, pg8000.legacy.PreparedStatement]] = {}
+        self.__local: threading.local = threading.local()
+        self.__metadata: TTLCache = TTLCache(max_size = 4096, ttl = 300)
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers = self.pool_size, 
+                                                               thread_name_prefix = "database")
+        self.aio: AsyncDatabase = AsyncDatabase(self)
+        self.batch_window: float = batch_window
+        self.__batch: list[tuple[Callable[[], Any], asyncio.Future]] = []
+        self.__flusher: Optional[asyncio.Task] = None
         if self.logger != None: self.logger.info("Database connected")
         return
 
     def __del__(self):
-        self.connection.close()
+        self.executor.shutdown(wait = False)
+        while True:
+            try: connection = self.__pool.get_nowait()
+            except Empty: break
+            if connection != None: connection.close()
         if self.logger != None: self.logger.info("Database disconnected")
         return
     
+    # %% managing pooled connections
+    @contextmanager
+    def __connection(self) -> Iterator[pg8000.Connection]:
+        connection = self.__pool.get()
+        try:
+            if connection == None: connection = pg8000.connect(**self.config)
+            yield connection
+        except:
+            try: connection.rollback()
+            except: 
+                self.__statements.pop(connection, None)
+                try: connection.close()
+                except: pass
+                connection = None
+            raise
+        finally: self.__pool.put(connection)
+        
+    def __prepare(self, connection: pg8000.Connection, command: str) -> pg8000.legacy.PreparedStatement:
+        # Caching prepared statements per connection, as every command has a fixed shape with bind parameters
+        statements: dict[str, pg8000.legacy.PreparedStatement] = self.__statements.setdefault(connection, {})
+        if command not in statements: statements[command] = connection.prepare(command)
+        return statements[command]
+        
+    @contextmanager
+    def __session(self) -> Iterator[tuple[pg8000.Connection, bool]]:
+        # Reusing the connection of the running transaction in this thread, which then owns the commit
+        connection = getattr(self.__local, "connection", None)
+        if connection != None: yield connection, False; return
+        with self.__connection() as connection: yield connection, True
+        
+    @contextmanager
+    def transaction(self) -> Iterator[pg8000.Connection]:
+        # Grouping every statement issued inside into one commit, joining the outer one when nested
+        connection = getattr(self.__local, "connection", None)
+        if connection != None: yield connection; return
+        with self.__connection() as connection:
+            self.__local.connection = connection
+            try: yield connection; connection.commit()
+            finally: self.__local.connection = None
+        
+    async def run(self, function: Callable, *args, **kwargs) -> Any:
+        # Timing the method on its executor thread, so waiting for a free thread is not counted
+        def timed() -> Any:
+            with QUERY_SECONDS.time(method = getattr(function, "__name__", "unknown").split("__")[-1]):
+                return function(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, timed)
+    
+    # %% timing statements
+    def __timed(self, method: str, connection: pg8000.Connection, command: str, 
+                execute: Callable[[], Any], **params) -> Any:
+        # Labelling the statement with the method issuing it, which every caller passes along explicitly
+        start = time.perf_counter(); result = execute(); duration = time.perf_counter() - start
+        STATEMENT_SECONDS.observe(duration, method = method)
+        if self.slow_query_ms > 0 and duration * 1000 >= self.slow_query_ms: 
+            # Explaining each method at most once per interval, so a slow database is not loaded further
+            now = time.monotonic()
+            if now - self.__explained.get(method, -EXPLAIN_INTERVAL) >= EXPLAIN_INTERVAL:
+                self.__explained[method] = now; self.__explain(connection, method, duration, command, **params)
+        return result
+    
+    def __explain(self, connection: pg8000.Connection, method: str, duration: float, command: str, **params) -> None:
+        # Running the statement again under a savepoint which is always rolled back, so writes and the triggers
+        # they fire show up in the plan without being applied twice, and a failure leaves the transaction usable
+        try:
+            connection.run("SAVEPOINT explain_slow;")
+            try: plan = connection.run(f"EXPLAIN (ANALYZE, BUFFERS) {command}", **params)
+            finally: connection.run("ROLLBACK TO SAVEPOINT explain_slow;"); connection.run("RELEASE SAVEPOINT explain_slow;")
+        except: 
+            if self.logger != None: self.logger.warning(f"Fail to explain the slow statement of {method}")
+            return
+        shown = {name: f"<{len(value)} values>" if isinstance(value, list) else value for name, value in params.items()}
+        self.slow_logger.warning(f"{method} took {duration * 1000:.0f} ms with {shown}\n{command}\n"
+                               + "\n".join([row[0] for row in plan])); return
+    
+    async def batch(self, function: Callable, *args, **kwargs) -> Any:
+        # Queuing a write to be committed together with the writes of other collectors in the same process,
+        # where writes arriving within the window, or while a batch is committing, share the next commit
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.__batch.append((partial(function, *args, **kwargs), future))
+        if self.__flusher == None or self.__flusher.done(): self.__flusher = asyncio.create_task(self.__flush())
+        return await future
+    
+    async def __flush(self) -> None:
+        while self.__batch != []:
+            await asyncio.sleep(self.batch_window)
+            writes, self.__batch = self.__batch, []
+            results = await self.run(self.__commitBatch, [write for write, _ in writes])
+            for (_, future), result in zip(writes, results):
+                if future.done(): continue
+                if isinstance(result, Exception): future.set_exception(result)
+                else: future.set_result(result)
+        return
+    
+    def __commitBatch(self, writes: list[Callable[[], Any]]) -> list[Any]:
+        try:
+            with self.transaction(): return [write() for write in writes]
+        except Exception as exception: 
+            if len(writes) == 1: return [exception]
+        
+        # Falling back to a transaction per write, so a failing write does not hold back the others
+        results: list[Any] = []
+        for write in writes:
+            try: 
+                with self.transaction(): results.append(write())
+            except Exception as exception: results.append(exception)
+        return results
+    
+    async def listen(self, channels: list[str], callback: Callable[[str, str], Any], 
+                     interval: Optional[float] = 1) -> None:
+        # Polling a dedicated connection outside the pool, as notifications are only read along with responses
+        while True:
+            try:
+                connection: pg8000.Connection = await asyncio.to_thread(pg8000.connect, **self.config)
+                connection.autocommit = True
+                for channel in channels: await asyncio.to_thread(connection.run, f"LISTEN {channel};")
+                try:
+                    while True:
+                        while len(connection.notifications) > 0:
+                            _, channel, payload = connection.notifications.popleft()
+                            result = callback(channel, payload)
+                            if asyncio.iscoroutine(result): await result
+                        await asyncio.sleep(interval); await asyncio.to_thread(connection.run, "SELECT 1;")
+                finally: connection.close()
+            except asyncio.CancelledError: raise
+            except: 
+                if self.logger != None: self.logger.warning(f"Listening to {', '.join(channels)} is interrupted")
+                await asyncio.sleep(interval * 10)
+    
     # %% generating SQL command 
     def __createTable(self, table_name: str, columns: dict[str, str],
                       primary_keys: Optional[list[str]] = [], 
@@ -32,13 +201,22 @@ class Database:
                 + ");"
         return command
         
+    def __createPartition(self, table_name: str, parent_name: str, values: Optional[list[str]] = None, 
+                          partition_by: Optional[str] = "") -> str:
+        command = f"CREATE TABLE IF NOT EXISTS {table_name} PARTITION OF {parent_name}" \
+                + (" DEFAULT" if values == None else f" FOR VALUES IN ({', '.join(values)})") \
+                + ("" if partition_by == "" else f" PARTITION BY {partition_by}") \
+                + ";"
+        return command
+        
     def __createIndex(self, index_name: str, table_name: str, orders: list[str]) -> str:
         command = f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(orders)});"
         return command
     
-    def __select(self, tables: list[str], columns: list[str], conditions: Optional[str] = "", 
-                 group_by: Optional[str] = "", order_by: Optional[list[str]] = [], limit: Optional[int] = None) -> str:
-        command = f"SELECT {', '.join(columns)} FROM {', '.join(tables)}" \
+    def __select(self, tables: list[str], columns: list[str], conditions: Optional[str] = "", group_by: Optional[str] = "", 
+                 order_by: Optional[list[str]] = [], limit: Optional[Union[int, str]] = None) -> str:
+        command = f"SELECT {', '.join(columns)}" \
+                + ("" if tables == [] else f" FROM {', '.join(tables)}") \
                 + ("" if conditions == "" else f" WHERE {conditions}") \
                 + ("" if group_by == "" else f" GROUP BY {group_by}") \
                 + ("" if order_by == [] else f" ORDER BY {', '.join(order_by)}") \
@@ -53,9 +231,24 @@ class Database:
                 + f" ON CONFLICT ({', '.join(conflict_targets)}) DO {conflict_action};"
         return command
     
-    def __update(self, table_name: str, set_columns: dict[str, str], conditions: str) -> str:
+    def __insertSelect(self, table_name: str, columns: list[str], select: str, 
+                       conflict_targets: list[str], conflict_action: str) -> str:
+        command = f"INSERT INTO {table_name} ({', '.join(columns)}) {select[:-1]}" \
+                + f" ON CONFLICT ({', '.join(conflict_targets)}) DO {conflict_action};"
+        return command
+    
+    def __insertUnnest(self, table_name: str, columns: list[str], values: list[str], arrays: dict[str, str], 
+                       conflict_targets: list[str], conflict_action: str) -> str:
+        unnest = "UNNEST(" + ", ".join([f"CAST(:{name} AS {type}[])" for name, type in arrays.items()]) \
+               + f") AS data ({', '.join(arrays.keys())})"
+        return self.__insertSelect(table_name, columns, self.__select([unnest], values), 
+                                   conflict_targets, conflict_action)
+    
+    def __update(self, table_name: str, set_columns: dict[str, str], conditions: str, 
+                 from_tables: Optional[list[str]] = []) -> str:
         set_columns: list = [column + " = " + value for column, value in set_columns.items()]
         command = f"UPDATE {table_name} SET {', '.join(set_columns)}" \
+                + ("" if from_tables == [] else f" FROM {', '.join(from_tables)}") \
                 + ("" if conditions == "" else f" WHERE {conditions}") \
                 + ";"
         return command
@@ -74,161 +267,418 @@ class Database:
         return command
     
     def __createTriggerFunction(self, function_name: str, commands: list[str], 
-                                declares: Optional[dict[str, str]] = {}) -> str:
+                                declares: Optional[dict[str, str]] = {}, returns: Optional[str] = "NEW") -> str:
         command = f"CREATE OR REPLACE FUNCTION {function_name}() RETURNS TRIGGER AS $$" \
                 + ("" if declares == {} else " DECLARE " \
                      + " ".join([f"{var_name} {var_type};" for var_name, var_type in declares.items()])) \
-                + f" BEGIN {' '.join(commands)} RETURN NEW; END; $$ LANGUAGE plpgsql;"
+                + f" BEGIN {' '.join(commands)} RETURN {returns}; END; $$ LANGUAGE plpgsql;"
         return command
     
     def __createTrigger(self, trigger_name: str, trigger_when: str, trigger_event: str,
-                        table_name: str, execute_procedure: str, for_each: Optional[str] = ""):
+                        table_name: str, execute_procedure: str, for_each: Optional[str] = "", 
+                        referencing: Optional[dict[str, str]] = {}):
         command = f"CREATE OR REPLACE TRIGGER {trigger_name} {trigger_when} {trigger_event} ON {table_name}" \
+                + ("" if referencing == {} else " REFERENCING " \
+                     + " ".join([f"{kind} TABLE AS {alias}" for kind, alias in referencing.items()])) \
                 + ("" if for_each == "" else f" FOR EACH {for_each}") \
                 + f" EXECUTE PROCEDURE {execute_procedure}();"
         return command
     
     # %% creating table and corresponding trigger with function
     def createTableForUsers(self) -> None:
-        cursor = self.connection.cursor()
-        table = self.__createTable("user_setting", 
-                                   {"id": "BIGINT PRIMARY KEY", "serverId": "SMALLINT", 
-                                    "isChangeNotify": "BOOLEAN", "isCPNotify": "BOOLEAN"})
-        cursor.execute(table)
-        table = self.__createTable("user_uid", {"id": "BIGINT", "serverId": "SMALLINT", "uid": "BIGINT"},
-                                   ["serverId", "id"], [["to_user", "id", "user_setting", "id"]])
-        cursor.execute(table)
-        table = self.__createTable("user_target",
-                                   {"id": "BIGINT", "serverId": "SMALLINT", "eventId": "SMALLINT", 
-                                    "targetPoints": "INTEGER"},
-                                   ["serverId", "eventId", "id"], 
-                                   [["to_user_uid", "serverId, id", "user_uid", "serverId, id"]])
-        cursor.execute(table); self.connection.commit()
-        cursor.close()
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            table = self.__createTable("user_setting", 
+                                       {"id": "BIGINT PRIMARY KEY", "serverId": "SMALLINT", 
+                                        "isChangeNotify": "BOOLEAN", "isCPNotify": "BOOLEAN"})
+            cursor.execute(table)
+            table = self.__createTable("user_uid", {"id": "BIGINT", "serverId": "SMALLINT", "uid": "BIGINT"},
+                                       ["serverId", "id"], [["to_user", "id", "user_setting", "id"]])
+            cursor.execute(table)
+            table = self.__createTable("user_target",
+                                       {"id": "BIGINT", "serverId": "SMALLINT", "eventId": "SMALLINT", 
+                                        "targetPoints": "INTEGER"},
+                                       ["serverId", "eventId", "id"], 
+                                       [["to_user_uid", "serverId, id", "user_uid", "serverId, id"]])
+            cursor.execute(table)
+            cursor.close()
         
     def createTableForChannels(self) -> None:
-        cursor = self.connection.cursor()
-        table = self.__createTable("channel_setting", 
-                                   {"id": "BIGINT PRIMARY KEY", "serverId": "SMALLINT"})
-        cursor.execute(table); self.connection.commit()
-        cursor.close()
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            table = self.__createTable("channel_setting", 
+                                       {"id": "BIGINT PRIMARY KEY", "serverId": "SMALLINT"})
+            cursor.execute(table)
+            cursor.close()
         
     def createTableForEvents(self) -> None:
-        cursor = self.connection.cursor()
-        table = self.__createTable("event_detail",
-                                   {"id": "SMALLINT", "serverId": "SMALLINT", "name": "VARCHAR(128)", 
-                                    "type": "SMALLINT", "startAt": "BIGINT", "endAt": "BIGINT"},
-                                   ["serverId", "id"])
-        cursor.execute(table); self.connection.commit()
-        
-        table = self.__createTable("event_player",
-                                   {"serverId": "SMALLINT", "eventId": "SMALLINT", "uid": "BIGINT",
-                                    "name": "VARCHAR(32)", "introduction": "VARCHAR(64)",
-                                    "rank": "SMALLINT", "nowPoints": "INTEGER", "lastUpdateTime": "BIGINT"},
-                                   ["serverId", "eventId", "uid"], 
-                                   [["to_event", "serverId, eventId", "event_detail", "serverId, id"]])
-        index = self.__createIndex("event_player_nowPoints_desc", "event_player", 
-                                   ["serverId", "eventId", "nowPoints DESC NULLS LAST"])
-        cursor.execute(table); cursor.execute(index); self.connection.commit()
-        
-        table = self.__createTable("event_points",
-                                   {"serverId": "SMALLINT", "eventId": "SMALLINT", "uid": "BIGINT",
-                                    "value": "INTEGER", "time": "BIGINT"},
-                                   ["serverId", "eventId", "uid", "value"],
-                                   [["to_player", "serverId, eventId, uid", "event_player", "serverId, eventId, uid"]])
-        cursor.execute(table)
-        table = self.__createTable("event_intervals",
-                                   {"serverId": "SMALLINT", "eventId": "SMALLINT", "uid": "BIGINT",
-                                    "startTime": "BIGINT", "endTime": "BIGINT", "valueDelta": "INTEGER"},
-                                   ["serverId", "eventId", "uid", "startTime"],
-                                   [["to_player", "serverId, eventId, uid", "event_player", "serverId, eventId, uid"]])
-        cursor.execute(table)
-        table = self.__createTable("event_ranks",
-                                   {"serverId": "SMALLINT", "eventId": "SMALLINT", "uid": "BIGINT",
-                                    "updateTime": "BIGINT", "fromRank": "SMALLINT", "toRank": "SMALLINT"},
-                                   ["serverId", "eventId", "uid", "updateTime"],
-                                   [["to_player", "serverId, eventId, uid", "event_player", "serverId, eventId, uid"]])
-        index = self.__createIndex("event_ranks_updateTime_desc", "event_ranks", 
-                                   ["serverId", "eventId", "updateTime DESC NULLS LAST"])
-        cursor.execute(table); cursor.execute(index); self.connection.commit()
-        
-        update = self.__update("event_player", {"nowPoints": "new.value", "lastUpdateTime": "new.time"}, 
-                               "serverId = new.serverId AND eventId = new.eventId AND uid = new.uid AND nowPoints < new.value")
-        trigger_function = self.__createTriggerFunction("event_newPoints", [update])
-        trigger = self.__createTrigger("event_newPoints", "AFTER", "INSERT", "event_points", "event_newPoints", "ROW")
-        cursor.execute(trigger_function); cursor.execute(trigger); self.connection.commit()
-        
-        insert = self.__insert("event_ranks", ["serverId", "eventId", "uid", "updateTime", "fromRank", "toRank"], 
-                               [["new.serverId", "new.eventId", "checking.uid", 
-                                 "new.lastUpdateTime", "now.toRank", "checking.rank"]],
-                               ["serverId", "eventId", "uid", "updateTime"], "UPDATE SET toRank = EXCLUDED.toRank")
-        conditional = self.__conditional(["now.toRank <> checking.rank"], [[insert]])
-        range = self.__select(["event_ranks"], ["*"], "uid = checking.uid", 
-                              order_by = ["updateTime DESC"], limit = 1)[:-1]
-        for_loop = self.__forLoop("now", range, [conditional])
-        range = self.__select(["event_player"], ["uid", "RANK() OVER (ORDER BY nowPoints DESC) AS rank"], 
-                              "serverId = new.serverId AND eventId = new.eventId")[:-1]
-        for_loop = self.__forLoop("checking", range, [for_loop])
-        commands = [for_loop]
-        insert = self.__insert("event_intervals", ["serverId", "eventId", "uid", "startTime", "endTime", "valueDelta"], 
-                               [["new.serverId", "new.eventId", "new.uid", 
-                                 "old.lastUpdateTime", "new.lastUpdateTime", "new.nowPoints - old.nowPoints"]], 
-                               ["serverId", "eventId", "uid", "startTime"], "NOTHING")
-        conditional = self.__conditional(["new.lastUpdateTime - old.lastUpdateTime >= 1200"], [[insert]])
-        commands.append(conditional)
-        trigger_function = self.__createTriggerFunction("event_newUpdate", commands, 
-                                                        {"checking": "RECORD", "now": "RECORD"})
-        trigger = self.__createTrigger("event_newUpdate", "AFTER", "UPDATE OF nowPoints", 
-                                       "event_player", "event_newUpdate", "ROW")
-        cursor.execute(trigger_function); cursor.execute(trigger); self.connection.commit()
-        
-        cursor.close()
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            table = self.__createTable("event_detail",
+                                       {"id": "SMALLINT", "serverId": "SMALLINT", "name": "VARCHAR(128)", 
+                                        "type": "SMALLINT", "startAt": "BIGINT", "endAt": "BIGINT"},
+                                       ["serverId", "id"])
+            cursor.execute(table)
+        
+            table = self.__createTable("event_player",
+                                       {"serverId": "SMALLINT", "eventId": "SMALLINT", "uid": "BIGINT",
+                                        "name": "VARCHAR(32)", "introduction": "VARCHAR(64)",
+                                        "rank": "SMALLINT", "nowPoints": "INTEGER", "lastUpdateTime": "BIGINT"},
+                                       ["serverId", "eventId", "uid"], 
+                                       [["to_event", "serverId, eventId", "event_detail", "serverId, id"]])
+            index = self.__createIndex("event_player_nowPoints_desc", "event_player", 
+                                       ["serverId", "eventId", "nowPoints DESC NULLS LAST"])
+            cursor.execute(table); cursor.execute(index)
+        
+            table = self.__createTable("event_points",
+                                       {"serverId": "SMALLINT", "eventId": "SMALLINT", "uid": "BIGINT",
+                                        "value": "INTEGER", "time": "BIGINT"},
+                                       ["serverId", "eventId", "uid", "value"],
+                                       [["to_player", "serverId, eventId, uid", "event_player", "serverId, eventId, uid"]])
+            cursor.execute(table)
+            table = self.__createTable("event_intervals",
+                                       {"serverId": "SMALLINT", "eventId": "SMALLINT", "uid": "BIGINT",
+                                        "startTime": "BIGINT", "endTime": "BIGINT", "valueDelta": "INTEGER"},
+                                       ["serverId", "eventId", "uid", "startTime"],
+                                       [["to_player", "serverId, eventId, uid", "event_player", "serverId, eventId, uid"]])
+            cursor.execute(table)
+            table = self.__createTable("event_ranks",
+                                       {"serverId": "SMALLINT", "eventId": "SMALLINT", "uid": "BIGINT",
+                                        "updateTime": "BIGINT", "fromRank": "SMALLINT", "toRank": "SMALLINT"},
+                                       ["serverId", "eventId", "uid", "updateTime"],
+                                       [["to_player", "serverId, eventId, uid", "event_player", "serverId, eventId, uid"]])
+            index = self.__createIndex("event_ranks_updateTime_desc", "event_ranks", 
+                                       ["serverId", "eventId", "updateTime DESC NULLS LAST"])
+            cursor.execute(table); cursor.execute(index)
+        
+            # Recording stop intervals between successive increasing points of every player in the statement,
+            # then moving each player to its highest new point, so both run once per inserted snapshot
+            touched = self.__select(["event_player", "(SELECT DISTINCT serverId, eventId, uid FROM new_points) AS touched"], 
+                                    ["event_player.serverId", "event_player.eventId", "event_player.uid", 
+                                     "lastUpdateTime AS time", "nowPoints AS value"], 
+                                    "event_player.serverId = touched.serverId AND event_player.eventId = touched.eventId "
+                                  + "AND event_player.uid = touched.uid")[:-1]
+            increased = self.__select(["new_points", "event_player"], 
+                                      ["new_points.serverId", "new_points.eventId", "new_points.uid", 
+                                       "new_points.time", "new_points.value"], 
+                                      "event_player.serverId = new_points.serverId AND event_player.eventId = new_points.eventId "
+                                    + "AND event_player.uid = new_points.uid AND new_points.value > event_player.nowPoints")[:-1]
+            steps = self.__select([f"({touched} UNION ALL {increased}) AS steps"], 
+                                  ["serverId", "eventId", "uid", "time", "value",
+                                   "LAG(time) OVER (PARTITION BY serverId, eventId, uid ORDER BY value) AS lastTime",
+                                   "LAG(value) OVER (PARTITION BY serverId, eventId, uid ORDER BY value) AS lastValue"])[:-1]
+            insert = self.__insertSelect("event_intervals", 
+                                         ["serverId", "eventId", "uid", "startTime", "endTime", "valueDelta"], 
+                                         self.__select([f"({steps}) AS gaps"], 
+                                                       ["serverId", "eventId", "uid", "lastTime", "time", "value - lastValue"], 
+                                                       "lastTime IS NOT NULL AND time - lastTime >= 1200"), 
+                                         ["serverId", "eventId", "uid", "startTime"], "NOTHING")
+            latest = self.__select(["new_points"], 
+                                   ["DISTINCT ON (serverId, eventId, uid) serverId, eventId, uid, value, time"], 
+                                   order_by = ["serverId", "eventId", "uid", "value DESC"])[:-1]
+            update = self.__update("event_player", {"nowPoints": "latest.value", "lastUpdateTime": "latest.time"}, 
+                                   "event_player.serverId = latest.serverId AND event_player.eventId = latest.eventId "
+                                 + "AND event_player.uid = latest.uid AND event_player.nowPoints < latest.value", 
+                                   [f"({latest}) AS latest"])
+            trigger_function = self.__createTriggerFunction("event_newPoints", [insert, update], returns = "NULL")
+            trigger = self.__createTrigger("event_newPoints", "AFTER", "INSERT", "event_points", "event_newPoints", 
+                                           "STATEMENT", {"NEW": "new_points"})
+            cursor.execute(trigger_function); cursor.execute(trigger)
+        
+            # Re-ranking each event touched by the statement once, and recording the players whose rank moved
+            # compared with their latest recorded rank in the same server and event
+            touched = self.__select(["new_players", "old_players"], 
+                                    ["new_players.serverId", "new_players.eventId", 
+                                     "MAX(new_players.lastUpdateTime) AS updateTime"], 
+                                    "new_players.serverId = old_players.serverId AND new_players.eventId = old_players.eventId "
+                                  + "AND new_players.uid = old_players.uid AND new_players.nowPoints <> old_players.nowPoints", 
+                                    group_by = "new_players.serverId, new_players.eventId")[:-1]
+            ranked = self.__select(["event_player"], ["uid", "RANK() OVER (ORDER BY nowPoints DESC) AS rank"], 
+                                   "serverId = touched.serverId AND eventId = touched.eventId")[:-1]
+            now = self.__select(["event_ranks"], ["toRank"], 
+                                "serverId = touched.serverId AND eventId = touched.eventId AND uid = ranked.uid", 
+                                order_by = ["updateTime DESC"], limit = 1)[:-1]
+            insert = self.__insertSelect("event_ranks", ["serverId", "eventId", "uid", "updateTime", "fromRank", "toRank"], 
+                                         self.__select([f"({touched}) AS touched", f"LATERAL ({ranked}) AS ranked", 
+                                                        f"LATERAL ({now}) AS now"], 
+                                                       ["touched.serverId", "touched.eventId", "ranked.uid", 
+                                                        "touched.updateTime", "now.toRank", "ranked.rank"], 
+                                                       "now.toRank <> ranked.rank"), 
+                                         ["serverId", "eventId", "uid", "updateTime"], "UPDATE SET toRank = EXCLUDED.toRank")
+            trigger_function = self.__createTriggerFunction("event_newUpdate", [insert], returns = "NULL")
+            trigger = self.__createTrigger("event_newUpdate", "AFTER", "UPDATE", "event_player", "event_newUpdate", 
+                                           "STATEMENT", {"OLD": "old_players", "NEW": "new_players"})
+            cursor.execute(trigger_function); cursor.execute(trigger)
+        
+            cursor.close()
         
     def createTableForMonthlys(self) -> None:
-        cursor = self.connection.cursor()
-        table = self.__createTable("monthly_detail",
-                                   {"id": "SMALLINT", "serverId": "SMALLINT",
-                                    "name": "VARCHAR(128)", "startAt": "BIGINT", "endAt": "BIGINT"},
-                                   ["serverId", "id"])
-        cursor.execute(table); self.connection.commit()
-        
-        table = self.__createTable("monthly_player",
-                                   {"serverId": "SMALLINT", "monthlyId": "SMALLINT", "uid": "BIGINT",
-                                    "name": "VARCHAR(32)", "introduction": "VARCHAR(64)",
-                                    "rank": "SMALLINT", "nowPoints": "INTEGER", "lastUpdateTime": "BIGINT"},
-                                   ["serverId", "monthlyId", "uid"], 
-                                   [["to_monthly", "serverId, monthlyId", "monthly_detail", "serverId, id"]])
-        index = self.__createIndex("monthly_players_nowPoints_desc", "monthly_player", 
-                                   ["serverId", "monthlyId", "nowPoints DESC NULLS LAST"])
-        cursor.execute(table); cursor.execute(index); self.connection.commit()
-        
-        table = self.__createTable("monthly_points",
-                                   {"serverId": "SMALLINT", "monthlyId": "SMALLINT", "uid": "BIGINT",
-                                    "value": "INTEGER", "time": "BIGINT"}, ["serverId", "monthlyId", "uid", "value"],
-                                   [["to_player", "serverId, monthlyId, uid", 
-                                     "monthly_player", "serverId, monthlyId, uid"]])
-        cursor.execute(table); self.connection.commit()
-        
-        update = self.__update("monthly_player", {"nowPoints": "new.value", "lastUpdateTime": "new.time"}, 
-                               "serverId = new.serverId AND monthlyId = new.monthlyId AND uid = new.uid AND nowPoints < new.value")
-        trigger_function = self.__createTriggerFunction("monthly_newPoints", [update])
-        trigger = self.__createTrigger("monthly_newPoints", "AFTER", "INSERT", 
-                                       "monthly_points", "monthly_newPoints", "ROW")
-        cursor.execute(trigger_function); cursor.execute(trigger); self.connection.commit()
-        
-        cursor.close()
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            table = self.__createTable("monthly_detail",
+                                       {"id": "SMALLINT", "serverId": "SMALLINT",
+                                        "name": "VARCHAR(128)", "startAt": "BIGINT", "endAt": "BIGINT"},
+                                       ["serverId", "id"])
+            cursor.execute(table)
+        
+            table = self.__createTable("monthly_player",
+                                       {"serverId": "SMALLINT", "monthlyId": "SMALLINT", "uid": "BIGINT",
+                                        "name": "VARCHAR(32)", "introduction": "VARCHAR(64)",
+                                        "rank": "SMALLINT", "nowPoints": "INTEGER", "lastUpdateTime": "BIGINT"},
+                                       ["serverId", "monthlyId", "uid"], 
+                                       [["to_monthly", "serverId, monthlyId", "monthly_detail", "serverId, id"]])
+            index = self.__createIndex("monthly_players_nowPoints_desc", "monthly_player", 
+                                       ["serverId", "monthlyId", "nowPoints DESC NULLS LAST"])
+            cursor.execute(table); cursor.execute(index)
+        
+            table = self.__createTable("monthly_points",
+                                       {"serverId": "SMALLINT", "monthlyId": "SMALLINT", "uid": "BIGINT",
+                                        "value": "INTEGER", "time": "BIGINT"}, ["serverId", "monthlyId", "uid", "value"],
+                                       [["to_player", "serverId, monthlyId, uid", 
+                                         "monthly_player", "serverId, monthlyId, uid"]])
+            cursor.execute(table)
+        
+            update = self.__update("monthly_player", {"nowPoints": "new.value", "lastUpdateTime": "new.time"}, 
+                                   "serverId = new.serverId AND monthlyId = new.monthlyId AND uid = new.uid AND nowPoints < new.value")
+            trigger_function = self.__createTriggerFunction("monthly_newPoints", [update])
+            trigger = self.__createTrigger("monthly_newPoints", "AFTER", "INSERT", 
+                                           "monthly_points", "monthly_newPoints", "ROW")
+            cursor.execute(trigger_function); cursor.execute(trigger)
+        
+            cursor.close()
+        
+    def createIndexForHistory(self) -> None:
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            index = self.__createIndex("event_points_uid_time", "event_points", 
+                                       ["serverId", "eventId", "uid", "time"])
+            cursor.execute(index)
+            cursor.close()
+        
+    def createNotifyForRanks(self) -> None:
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            cursor.execute("ALTER TABLE channel_setting ADD COLUMN IF NOT EXISTS isChangeNotify BOOLEAN DEFAULT FALSE;")
+            
+            # Announcing each event whose top 10 moved in the statement, which is delivered with the collector commit
+            changed = self.__select(["new_ranks"], ["serverId", "eventId", "MAX(updateTime) AS updateTime"], 
+                                    "fromRank <> toRank AND (fromRank BETWEEN 1 AND 10 OR toRank BETWEEN 1 AND 10)", 
+                                    group_by = "serverId, eventId")[:-1]
+            notify = self.__select([f"({changed}) AS changed"], 
+                                   ["pg_notify('event_ranks', serverId || ':' || eventId || ':' || updateTime)"])
+            trigger_function = self.__createTriggerFunction("event_ranks_newRanks", ["PERFORM" + notify[len("SELECT"):]], 
+                                                            returns = "NULL")
+            trigger = self.__createTrigger("event_ranks_newRanks", "AFTER", "INSERT", "event_ranks", 
+                                           "event_ranks_newRanks", "STATEMENT", {"NEW": "new_ranks"})
+            cursor.execute(trigger_function); cursor.execute(trigger)
+            cursor.close()
+        
+    def partitionEventHistory(self) -> None:
+        # Moving each history table under a list partition per server and then per event, with default ones
+        # catching the rest, so queries on the current event only touch a small table
+        histories = {"event_points": "value", "event_intervals": "startTime", "event_ranks": "updateTime"}
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            cursor.execute(self.__select(["event_detail"], ["serverId", "id"])); events = cursor.fetchall()
+            for table_name, key in histories.items():
+                cursor.execute(f"ALTER TABLE {table_name} RENAME TO {table_name}_legacy;")
+                cursor.execute(f"ALTER TABLE {table_name}_legacy RENAME CONSTRAINT {table_name}_pkey TO {table_name}_legacy_pkey;")
+                cursor.execute(f"CREATE TABLE {table_name} (LIKE {table_name}_legacy INCLUDING DEFAULTS, "
+                               f"PRIMARY KEY (serverId, eventId, uid, {key}), CONSTRAINT to_player FOREIGN KEY "
+                               "(serverId, eventId, uid) REFERENCES event_player(serverId, eventId, uid)) "
+                               "PARTITION BY LIST (serverId);")
+                for server_id in range(4):
+                    cursor.execute(self.__createPartition(f"{table_name}_s{server_id}", table_name, [str(server_id)], 
+                                                          "LIST (eventId)"))
+                    cursor.execute(self.__createPartition(f"{table_name}_s{server_id}_default", f"{table_name}_s{server_id}"))
+                cursor.execute(self.__createPartition(f"{table_name}_default", table_name))
+                for server_id, event_id in events:
+                    cursor.execute(self.__createPartition(f"{table_name}_s{server_id}_e{event_id}", 
+                                                          f"{table_name}_s{server_id}", [str(event_id)]))
+                cursor.execute(f"INSERT INTO {table_name} SELECT * FROM {table_name}_legacy;")
+                cursor.execute(f"DROP TABLE {table_name}_legacy;")
+            
+            # Recreating the indexes and triggers dropped along with the legacy tables
+            index = self.__createIndex("event_points_uid_time", "event_points", ["serverId", "eventId", "uid", "time"])
+            cursor.execute(index)
+            index = self.__createIndex("event_ranks_updateTime_desc", "event_ranks", 
+                                       ["serverId", "eventId", "updateTime DESC NULLS LAST"])
+            cursor.execute(index)
+            trigger = self.__createTrigger("event_newPoints", "AFTER", "INSERT", "event_points", "event_newPoints", 
+                                           "STATEMENT", {"NEW": "new_points"})
+            cursor.execute(trigger)
+            trigger = self.__createTrigger("event_ranks_newRanks", "AFTER", "INSERT", "event_ranks", 
+                                           "event_ranks_newRanks", "STATEMENT", {"NEW": "new_ranks"})
+            cursor.execute(trigger)
+            
+            # Creating the partitions of a new event along with its detail
+            loop = self.__forLoop("history", "SELECT UNNEST(ARRAY['" + "', '".join(histories.keys()) + "'])", 
+                                  ["EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES IN (%s);', "
+                                 + "history || '_s' || NEW.serverId || '_e' || NEW.id, history || '_s' || NEW.serverId, NEW.id);"])
+            trigger_function = self.__createTriggerFunction("event_newDetail", [loop], {"history": "TEXT"})
+            trigger = self.__createTrigger("event_newDetail", "AFTER", "INSERT", "event_detail", "event_newDetail", "ROW")
+            cursor.execute(trigger_function); cursor.execute(trigger)
+            cursor.close()
+        
+    def createRollupForHistory(self) -> None:
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            table = self.__createTable("event_points_hourly",
+                                       {"serverId": "SMALLINT", "eventId": "SMALLINT", "uid": "BIGINT", "hourTime": "BIGINT", 
+                                        "pointsNum": "INTEGER", "maxValue": "INTEGER", "lastTime": "BIGINT"},
+                                       ["serverId", "eventId", "uid", "hourTime"],
+                                       [["to_player", "serverId, eventId, uid", "event_player", "serverId, eventId, uid"]])
+            cursor.execute(table)
+            cursor.close()
+        
+    def createCompactionState(self) -> None:
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            table = self.__createTable("event_compaction", 
+                                       {"serverId": "SMALLINT", "eventId": "SMALLINT", "compactedBefore": "BIGINT"}, 
+                                       ["serverId", "eventId"], 
+                                       [["to_event", "serverId, eventId", "event_detail", "serverId, id"]])
+            cursor.execute(table)
+            cursor.close()
         
+    def createCountersForPoints(self) -> None:
+        # Counting points newer than the compaction of their event by hour, since older ones are already counted
+        # and their raw rows are gone, so inserting them again would not conflict; any other point counted
+        # before still has its raw row, so its insertion conflicts and never reaches the transition table
+        def count(points: str) -> str:
+            compacted = f"{points} LEFT JOIN event_compaction ON event_compaction.serverId = {points}.serverId " \
+                      + f"AND event_compaction.eventId = {points}.eventId"
+            return self.__insertSelect("event_points_hourly", 
+                                       ["serverId", "eventId", "uid", "hourTime", "pointsNum", "maxValue", "lastTime"], 
+                                       self.__select([compacted], 
+                                                     [f"{points}.serverId", f"{points}.eventId", "uid", "time - time % 3600", 
+                                                      "COUNT(uid)", "MAX(value)", "MAX(time)"], 
+                                                     "time >= COALESCE(compactedBefore, 0)", 
+                                                     group_by = f"{points}.serverId, {points}.eventId, uid, time - time % 3600"), 
+                                       ["serverId", "eventId", "uid", "hourTime"], 
+                                       "UPDATE SET pointsNum = event_points_hourly.pointsNum + EXCLUDED.pointsNum, "
+                                     + "maxValue = GREATEST(event_points_hourly.maxValue, EXCLUDED.maxValue), "
+                                     + "lastTime = GREATEST(event_points_hourly.lastTime, EXCLUDED.lastTime)")
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            
+            # Counting the points stored so far once, as the trigger only counts the ones inserted afterwards
+            cursor.execute(count("event_points"))
+            trigger_function = self.__createTriggerFunction("event_points_newCounts", [count("new_points")], returns = "NULL")
+            trigger = self.__createTrigger("event_points_newCounts", "AFTER", "INSERT", "event_points", 
+                                           "event_points_newCounts", "STATEMENT", {"NEW": "new_points"})
+            cursor.execute(trigger_function); cursor.execute(trigger)
+            cursor.close()
+    
+    # %% migrating schema with versions
+    def __migrations(self) -> list[tuple[str, Callable[[], None]]]:
+        # Listing schema changes in applying order, new changes must only be appended
+        return [
+            ("create tables for users", self.createTableForUsers),
+            ("create tables for channels", self.createTableForChannels),
+            ("create tables for events", self.createTableForEvents),
+            ("create tables for monthlys", self.createTableForMonthlys),
+            ("create index for history", self.createIndexForHistory),
+            ("create notify for ranks", self.createNotifyForRanks),
+            ("partition event history", self.partitionEventHistory),
+            ("create rollup for history", self.createRollupForHistory),
+            ("create compaction state", self.createCompactionState),
+            ("create counters for points", self.createCountersForPoints)
+        ]
+    
+    def __selectSchemaVersion(self) -> int:
+        select = self.__select(["schema_version"], ["COALESCE(MAX(version), 0)"])
+        try: return self.__doSelect("selectSchemaVersion", select)[0][0]
+        except pg8000.DatabaseError: return 0
+    
+    def migrate(self) -> None:
+        # Checking the version once, so an up-to-date schema costs a single query at startup
+        migrations = self.__migrations()
+        if self.__selectSchemaVersion() >= len(migrations): return
+        
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            table = self.__createTable("schema_version", 
+                                       {"version": "SMALLINT PRIMARY KEY", "name": "VARCHAR(128)", 
+                                        "appliedAt": "BIGINT DEFAULT ROUND(EXTRACT(EPOCH FROM now()))"})
+            cursor.execute(table); cursor.execute("LOCK TABLE schema_version IN EXCLUSIVE MODE;"); cursor.close()
+            for version in range(self.__selectSchemaVersion(), len(migrations)):
+                name, apply = migrations[version]; apply()
+                insert = self.__insert("schema_version", ["version", "name"], [[":version", ":name"]], 
+                                       ["version"], "NOTHING")
+                self.__doInsert("migrate", insert, version = version + 1, name = name)
+                if self.logger != None: self.logger.info(f"Database migrated to version {version + 1}: {name}")
+        return
+    
+    # %% compacting history
+    def compactEventHistory(self, server_id: int, raw_retention: int, ended_retention: int) -> None:
+        # Deleting raw points of live events older than the raw retention, and every point of events ended
+        # longer than the ended retention, as hourly rows already count them, where the raw retention always
+        # covers the 24 hours of ranges in the detail of players
+        raw_retention = max(raw_retention, 90000)
+        cutoffs = self.__select(["event_detail"],
+                                ["serverId", "id", "CAST(CASE WHEN ROUND(EXTRACT(EPOCH FROM now())) > endAt + :ended_retention "
+                               + "THEN endAt + :ended_retention ELSE ROUND(EXTRACT(EPOCH FROM now())) - :raw_retention END "
+                               + "AS BIGINT) AS cutoff"], "serverId = :server_id")[:-1]
+
+        # Cutting at the start of an hour, so the partial hours read from raw points are never deleted
+        cutoffs = self.__select([f"({cutoffs}) AS cutoffs"], ["serverId", "id", "cutoff - cutoff % 3600"])
+        
+        # Recording the cutoff of each event along with the deletion, so points older than it are never stored
+        # or counted again when a full history is fetched later
+        insert = self.__insertSelect("event_compaction", ["serverId", "eventId", "compactedBefore"], cutoffs, 
+                                     ["serverId", "eventId"], "UPDATE SET compactedBefore = "
+                                   + "GREATEST(event_compaction.compactedBefore, EXCLUDED.compactedBefore)")
+        delete = "DELETE FROM event_points USING event_compaction " \
+               + "WHERE event_points.serverId = event_compaction.serverId AND event_points.eventId = event_compaction.eventId " \
+               + "AND event_compaction.serverId = :server_id AND event_points.time < event_compaction.compactedBefore;"
+        with self.transaction():
+            self.__doInsert("compactEventHistory", insert, server_id = server_id, raw_retention = raw_retention, ended_retention = ended_retention)
+            self.__doInsert("compactEventHistory", delete, server_id = server_id)
+        return
+    
     # %% inserting data
-    def __insertValueProcess(self, values: list[list]) -> list[list[str]]:
-        return [["\'" + var.replace("\'", "\'\'").replace("\"", "\"\"") + "\'" 
-                 if isinstance(var, str) else (str(var).lower() if isinstance(var, bool) 
-                                               else ("NULL" if var == None else str(var)))
-                 for var in value] for value in values]
+    def __doInsert(self, method: str, insert: str, **params) -> None:
+        with self.__session() as (connection, is_own):
+            self.__timed(method, connection, insert, lambda: self.__prepare(connection, insert).run(**params), **params)
+            if is_own: connection.commit()
+            return
         
-    def __doInsert(self, insert: str) -> None:
-        cursor = self.connection.cursor(); cursor.execute(insert); 
-        self.connection.commit(); cursor.close(); return
+    def __copyRows(self, rows: Iterable[list], chunk_size: Optional[int] = 1000) -> Iterator[str]:
+        # Encoding rows lazily into COPY text format, a chunk of lines at a time
+        chunk: list[str] = []
+        for row in rows:
+            chunk.append("\t".join(["\\N" if value == None else str(value).replace("\\", "\\\\").replace("\t", "\\t")
+                                    .replace("\n", "\\n").replace("\r", "\\r") for value in row]) + "\n")
+            if len(chunk) >= chunk_size: yield "".join(chunk); chunk = []
+        if chunk != []: yield "".join(chunk)
         
+    def __doCopy(self, method: str, table_name: str, columns: list[str], rows: Iterable[list], 
+                 conflict_targets: list[str], conflict_action: str) -> None:
+        # Streaming rows into a transaction-scoped staging table, which is never WAL-logged, then merging them
+        staging = f"{table_name}_staging"
+        merge = self.__insertSelect(table_name, columns, self.__select(
+            [staging], [f"DISTINCT ON ({', '.join(conflict_targets)}) {', '.join(columns)}"]
+            if conflict_action.startswith("UPDATE") else columns), conflict_targets, conflict_action)
+        with self.__session() as (connection, is_own):
+            cursor = connection.cursor()
+            cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table_name}) ON COMMIT DROP;")
+            cursor.execute(f"COPY {staging} ({', '.join(columns)}) FROM STDIN;", stream = self.__copyRows(rows))
+            self.__timed(method, connection, merge, lambda: cursor.execute(merge))
+            cursor.execute(f"TRUNCATE {staging};"); cursor.close()
+            if is_own: connection.commit()
+            return
+        
+    def __invalidate(self, key: tuple[str, int]) -> None:
+        # Dropping the metadata here at once, and in every other process once the write commits
+        self.__metadata.invalidate(key)
+        select = self.__select([], ["pg_notify('metadata', :payload)"])
+        self.__doSelect("invalidate", select, payload = f"{key[0]}:{key[1]}"); return
+    
+    def onMetadata(self, channel: str, payload: str) -> None:
+        # Parsing the payload "<name>:<id>" sent along with writes of metadata
+        name, object_id = payload.split(":"); self.__metadata.invalidate((name, int(object_id))); return
+    
     def insertUserSetting(self, user_id: int, server_id: Optional[int] = None, 
                           is_change_notify: Optional[bool] = None, is_CP_notify: Optional[bool] = None) -> None:
         conflict_actions = []
@@ -239,182 +689,353 @@ class Database:
         if is_CP_notify == None: is_CP_notify = False
         else: conflict_actions.append("isCPNotify = EXCLUDED.isCPNotify")
         
-        values = self.__insertValueProcess([[user_id, server_id, is_change_notify, is_CP_notify]])
-        insert = self.__insert("user_setting", ["id", "serverId", "isChangeNotify", "isCPNotify"], values, ["id"], 
+        insert = self.__insert("user_setting", ["id", "serverId", "isChangeNotify", "isCPNotify"], 
+                               [[":user_id", ":server_id", ":is_change_notify", ":is_CP_notify"]], ["id"], 
                                "NOTHING" if conflict_actions == [] else "UPDATE SET " + ", ".join(conflict_actions))
-        self.__doInsert(insert); return
+        self.__doInsert("insertUserSetting", insert, user_id = user_id, server_id = server_id, 
+                        is_change_notify = is_change_notify, is_CP_notify = is_CP_notify)
+        self.__invalidate(("user_setting", user_id)); return
         
     def insertUserUid(self, user_id: int, server_id: int, uid: int) -> None:
-        values = self.__insertValueProcess([[user_id, server_id, uid]])
-        insert = self.__insert("user_uid", ["id", "serverId", "uid"], values, 
+        insert = self.__insert("user_uid", ["id", "serverId", "uid"], [[":user_id", ":server_id", ":uid"]], 
                                ["serverId", "id"], "UPDATE SET uid = EXCLUDED.uid")
-        self.__doInsert(insert); return
+        self.__doInsert("insertUserUid", insert, user_id = user_id, server_id = server_id, uid = uid)
+        self.__invalidate(("user_uid", user_id)); return
         
     def insertUserTarger(self, user_id: int, server_id: int, event_id: int, target_points: int) -> None:
-        values = self.__insertValueProcess([[user_id, server_id, event_id, target_points]])
-        insert = self.__insert("user_uid", ["id", "serverId", "eventId", "targetPoints"], values, 
+        insert = self.__insert("user_target", ["id", "serverId", "eventId", "targetPoints"], 
+                               [[":user_id", ":server_id", ":event_id", ":target_points"]], 
                                ["serverId", "eventId", "id"], "UPDATE SET targetPoints = EXCLUDED.targetPoints")
-        self.__doInsert(insert); return
+        self.__doInsert("insertUserTarger", insert, user_id = user_id, server_id = server_id, 
+                        event_id = event_id, target_points = target_points)
+        self.__invalidate(("user_target", user_id)); return
         
-    def insertChannelSetting(self, channel_id: int, server_id: Optional[int] = None) -> None:
-        if server_id == None: server_id = 2; conflict_action = "NOTHING"
-        else: conflict_action = "UPDATE SET serverId = EXCLUDED.serverId"
+    def insertChannelSetting(self, channel_id: int, server_id: Optional[int] = None, 
+                             is_change_notify: Optional[bool] = None) -> None:
+        conflict_actions = []
+        if server_id == None: server_id = 2
+        else: conflict_actions.append("serverId = EXCLUDED.serverId")
+        if is_change_notify == None: is_change_notify = False
+        else: conflict_actions.append("isChangeNotify = EXCLUDED.isChangeNotify")
         
-        values = self.__insertValueProcess([[channel_id, server_id]])
-        insert = self.__insert("channel_setting", ["id", "serverId"], values, ["id"], conflict_action)
-        self.__doInsert(insert); return
+        insert = self.__insert("channel_setting", ["id", "serverId", "isChangeNotify"], 
+                               [[":channel_id", ":server_id", ":is_change_notify"]], ["id"], 
+                               "NOTHING" if conflict_actions == [] else "UPDATE SET " + ", ".join(conflict_actions))
+        self.__doInsert("insertChannelSetting", insert, channel_id = channel_id, server_id = server_id, 
+                        is_change_notify = is_change_notify)
+        self.__invalidate(("channel_setting", channel_id)); return
     
     def insertEventDetail(self, server_id: int, event_id: int, event_name: str,  
                           event_type: int, event_start_at: int, event_ent_at: int) -> None:
-        values = self.__insertValueProcess([[event_id, server_id, event_name, 
-                                             event_type, event_start_at, event_ent_at]])
         insert = self.__insert("event_detail", ["id", "serverId", "name", "type", "startAt", "endAt"], 
-                               values, ["serverId", "id"], "NOTHING")
-        self.__doInsert(insert); return
+                               [[":event_id", ":server_id", ":event_name", ":event_type", 
+                                 ":event_start_at", ":event_end_at"]], ["serverId", "id"], 
+                               "UPDATE SET startAt = EXCLUDED.startAt, endAt = EXCLUDED.endAt "
+                             + "WHERE event_detail.startAt <> EXCLUDED.startAt OR event_detail.endAt <> EXCLUDED.endAt")
+        self.__doInsert("insertEventDetail", insert, server_id = server_id, event_id = event_id, event_name = event_name, 
+                        event_type = event_type, event_start_at = event_start_at, event_end_at = event_ent_at)
+        self.__invalidate(("recent_event_detail", server_id)); return
         
     def insertEventPlayers(self, server_id: int, event_id: int, players: list[list], default_time: int) -> None:
         if players == []: return
-        values = self.__insertValueProcess([[server_id, event_id] + player + [0, default_time] for player in players])
-        insert = self.__insert("event_player", ["serverId", "eventId", "uid", "name", "introduction", "rank", 
-                                "nowPoints", "lastUpdateTime"], values, ["serverId", "eventId", "uid"], 
-                               "UPDATE SET name = COALESCE(EXCLUDED.name, event_player.name), "
-                             + "introduction = COALESCE(EXCLUDED.introduction, event_player.introduction), "
-                             + "rank = COALESCE(EXCLUDED.rank, event_player.rank);")
-        self.__doInsert(insert); return
+        columns = ["serverId", "eventId", "uid", "name", "introduction", "rank", "nowPoints", "lastUpdateTime"]
+        conflict_action = "UPDATE SET name = COALESCE(EXCLUDED.name, event_player.name), " \
+                        + "introduction = COALESCE(EXCLUDED.introduction, event_player.introduction), " \
+                        + "rank = COALESCE(EXCLUDED.rank, event_player.rank)"
+        if len(players) >= BULK_THRESHOLD:
+            self.__doCopy("insertEventPlayers", "event_player", columns, ([server_id, event_id] + player + [0, default_time] 
+                                                    for player in players), ["serverId", "eventId", "uid"], conflict_action)
+            return
+        uid, name, introduction, rank = [list(column) for column in zip(*players)]
+        insert = self.__insertUnnest("event_player", columns, 
+                                     ["CAST(:server_id AS SMALLINT)", "CAST(:event_id AS SMALLINT)", 
+                                      "uid", "name", "introduction", "rank", "0", "CAST(:default_time AS BIGINT)"],
+                                     {"uid": "BIGINT", "name": "VARCHAR", "introduction": "VARCHAR", "rank": "SMALLINT"},
+                                     ["serverId", "eventId", "uid"], conflict_action)
+        self.__doInsert("insertEventPlayers", insert, server_id = server_id, event_id = event_id, default_time = default_time,
+                        uid = uid, name = name, introduction = introduction, rank = rank); return
     
     def insertDefaultEventRanks(self, server_id: int, event_id: int, uids: list[int], default_time: int) -> None:
         if uids == []: return
-        values = self.__insertValueProcess([[server_id, event_id, uid, default_time, -1, -1] for uid in uids])
-        insert = self.__insert("event_ranks", ["serverId", "eventId", "uid", "updateTime", "fromRank", "toRank"],
-                               values, ["serverId", "eventId", "uid", "updateTime"], 
-                               "UPDATE SET toRank = EXCLUDED.toRank")
-        self.__doInsert(insert); return
+        columns = ["serverId", "eventId", "uid", "updateTime", "fromRank", "toRank"]
+        if len(uids) >= BULK_THRESHOLD:
+            self.__doCopy("insertDefaultEventRanks", "event_ranks", columns, ([server_id, event_id, uid, default_time, -1, -1] for uid in uids), 
+                          ["serverId", "eventId", "uid", "updateTime"], "UPDATE SET toRank = EXCLUDED.toRank")
+            return
+        insert = self.__insertUnnest("event_ranks", columns,
+                                     ["CAST(:server_id AS SMALLINT)", "CAST(:event_id AS SMALLINT)", 
+                                      "uid", "CAST(:default_time AS BIGINT)", "-1", "-1"], {"uid": "BIGINT"},
+                                     ["serverId", "eventId", "uid", "updateTime"], "UPDATE SET toRank = EXCLUDED.toRank")
+        self.__doInsert("insertDefaultEventRanks", insert, server_id = server_id, event_id = event_id, default_time = default_time, 
+                        uid = list(uids)); return
     
     def insertEventPoints(self, server_id: int, event_id: int, points: list[list]) -> None:
         if points == []: return
-        values = self.__insertValueProcess([[server_id, event_id] + point for point in points])
-        insert = self.__insert("event_points", ["serverId", "eventId", "uid", "value", "time"],
-                               values, ["serverId", "eventId", "uid", "value"], "NOTHING")
-        self.__doInsert(insert); return
+        columns = ["serverId", "eventId", "uid", "value", "time"]
+        if len(points) >= BULK_THRESHOLD:
+            self.__doCopy("insertEventPoints", "event_points", columns, ([server_id, event_id] + point for point in points), 
+                          ["serverId", "eventId", "uid", "value"], "NOTHING")
+            return
+        uid, value, time = [list(column) for column in zip(*points)]
+        insert = self.__insertUnnest("event_points", columns,
+                                     ["CAST(:server_id AS SMALLINT)", "CAST(:event_id AS SMALLINT)", 
+                                      "uid", "value", "time"], {"uid": "BIGINT", "value": "INTEGER", "time": "BIGINT"},
+                                     ["serverId", "eventId", "uid", "value"], "NOTHING")
+        self.__doInsert("insertEventPoints", insert, server_id = server_id, event_id = event_id, uid = uid, value = value, time = time)
+        return
     
     def insertMonthlyDetail(self, server_id: int, monthly_id: int, monthly_name: str,  
                             monthly_start_at: int, monthly_ent_at: int) -> None:
-        values = self.__insertValueProcess([[monthly_id, server_id, monthly_name, monthly_start_at, monthly_ent_at]])
         insert = self.__insert("monthly_detail", ["id", "serverId", "name", "startAt", "endAt"], 
-                               values, ["serverId", "id"], "NOTHING")
-        self.__doInsert(insert); return
+                               [[":monthly_id", ":server_id", ":monthly_name", ":monthly_start_at", ":monthly_end_at"]], 
+                               ["serverId", "id"], "NOTHING")
+        self.__doInsert("insertMonthlyDetail", insert, server_id = server_id, monthly_id = monthly_id, monthly_name = monthly_name, 
+                        monthly_start_at = monthly_start_at, monthly_end_at = monthly_ent_at)
+        self.__invalidate(("recent_monthly_detail", server_id)); return
         
     def insertMonthlyPlayers(self, server_id: int, monthly_id: int, players: list[list], default_time: int) -> None:
         if players == []: return
-        values = self.__insertValueProcess([[server_id, monthly_id] + player + [0, default_time] for player in players])
-        insert = self.__insert("monthly_player", ["serverId", "monthlyId", "uid", "name", "introduction", "rank", 
-                                "nowPoints", "lastUpdateTime"], values, ["serverId", "monthlyId", "uid"], 
-                               "UPDATE SET name = EXCLUDED.name, introduction = EXCLUDED.introduction, rank = EXCLUDED.rank;")
-        self.__doInsert(insert); return
+        columns = ["serverId", "monthlyId", "uid", "name", "introduction", "rank", "nowPoints", "lastUpdateTime"]
+        conflict_action = "UPDATE SET name = EXCLUDED.name, introduction = EXCLUDED.introduction, rank = EXCLUDED.rank"
+        if len(players) >= BULK_THRESHOLD:
+            self.__doCopy("insertMonthlyPlayers", "monthly_player", columns, ([server_id, monthly_id] + player + [0, default_time] 
+                                                      for player in players), ["serverId", "monthlyId", "uid"], conflict_action)
+            return
+        uid, name, introduction, rank = [list(column) for column in zip(*players)]
+        insert = self.__insertUnnest("monthly_player", columns, 
+                                     ["CAST(:server_id AS SMALLINT)", "CAST(:monthly_id AS SMALLINT)", 
+                                      "uid", "name", "introduction", "rank", "0", "CAST(:default_time AS BIGINT)"],
+                                     {"uid": "BIGINT", "name": "VARCHAR", "introduction": "VARCHAR", "rank": "SMALLINT"},
+                                     ["serverId", "monthlyId", "uid"], conflict_action)
+        self.__doInsert("insertMonthlyPlayers", insert, server_id = server_id, monthly_id = monthly_id, default_time = default_time,
+                        uid = uid, name = name, introduction = introduction, rank = rank); return
     
     def insertMonthlyPoints(self, server_id: int, monthly_id: int, points: list[list]) -> None:
         if points == []: return
-        values = self.__insertValueProcess([[server_id, monthly_id] + point for point in points])
-        insert = self.__insert("monthly_points", ["serverId", "monthlyId", "uid", "value", "time"],
-                               values, ["serverId", "monthlyId", "uid", "value"], "NOTHING")
-        self.__doInsert(insert); return
+        columns = ["serverId", "monthlyId", "uid", "value", "time"]
+        if len(points) >= BULK_THRESHOLD:
+            self.__doCopy("insertMonthlyPoints", "monthly_points", columns, ([server_id, monthly_id] + point for point in points), 
+                          ["serverId", "monthlyId", "uid", "value"], "NOTHING")
+            return
+        uid, value, time = [list(column) for column in zip(*points)]
+        insert = self.__insertUnnest("monthly_points", columns,
+                                     ["CAST(:server_id AS SMALLINT)", "CAST(:monthly_id AS SMALLINT)", 
+                                      "uid", "value", "time"], {"uid": "BIGINT", "value": "INTEGER", "time": "BIGINT"},
+                                     ["serverId", "monthlyId", "uid", "value"], "NOTHING")
+        self.__doInsert("insertMonthlyPoints", insert, server_id = server_id, monthly_id = monthly_id, uid = uid, value = value, time = time)
+        return
+    
+    # %% inserting snapshots as a whole
+    def __notifySnapshot(self, kind: str, server_id: int, activity_id: int, points: list[list]) -> None:
+        # Announcing the snapshot to listeners, which is only delivered once the transaction commits
+        if points == []: return
+        select = self.__select([], ["pg_notify('snapshot', :payload)"])
+        self.__doSelect("notifySnapshot", select, payload = f"{kind}:{server_id}:{activity_id}:{max([point[2] for point in points])}")
+        return
+    
+    def insertEventSnapshot(self, server_id: int, event_id: int, players: list[list], points: list[list], 
+                            default_time: int, new_uids: Optional[list[int]] = None) -> None:
+        # Giving default ranks to the new uids only when the caller knows them, otherwise to every player,
+        # and Dropping points older than the compaction of the event, which are already counted hourly
+        if new_uids == None: new_uids = [player[0] for player in players]
+        with self.transaction():
+            compacted_before = self.selectEventCompactedBefore(server_id, event_id)
+            points = [point for point in points if point[2] >= compacted_before]
+            self.insertEventPlayers(server_id, event_id, players, default_time)
+            self.insertDefaultEventRanks(server_id, event_id, new_uids, default_time)
+            self.insertEventPoints(server_id, event_id, points)
+            self.__notifySnapshot("event", server_id, event_id, points)
+        return
+    
+    def insertMonthlySnapshot(self, server_id: int, monthly_id: int, players: list[list], 
+                              points: list[list], default_time: int) -> None:
+        with self.transaction():
+            self.insertMonthlyPlayers(server_id, monthly_id, players, default_time)
+            self.insertMonthlyPoints(server_id, monthly_id, points)
+            self.__notifySnapshot("monthly", server_id, monthly_id, points)
+        return
     
     # %% getting data
-    def __doSelect(self, select: str) -> tuple:
-        cursor = self.connection.cursor(); cursor.execute(select)
-        result = cursor.fetchall(); self.connection.commit(); cursor.close(); return result
+    def __doSelect(self, method: str, select: str, **params) -> tuple:
+        with self.__session() as (connection, is_own):
+            result = self.__timed(method, connection, select, lambda: self.__prepare(connection, select).run(**params), **params)
+            if is_own: connection.commit()
+            return result
+    
+    def __remember(self, key: tuple, result: list, version: int) -> list:
+        # Keeping rarely changing metadata in memory until written or expired, unless it was written while
+        # reading since the version was taken, where copies are returned as callers extend the lists
+        self.__metadata.set(key, result, version); return list(result)
     
     def selectUserSetting(self, user_id: int) -> list:
-        select = self.__select(["user_setting"], ["*"], f"id = {user_id}")
-        result = self.__doSelect(select); return ([] if result == () else list(result)[0])
+        key = ("user_setting", user_id); version = self.__metadata.version(key)
+        cached = self.__metadata.get(key)
+        if cached != None: return list(cached)
+        select = self.__select(["user_setting"], ["*"], "id = :user_id")
+        result = self.__doSelect("selectUserSetting", select, user_id = user_id)
+        return self.__remember(key, [] if result == () else list(result)[0], version)
     
     def selectUserUid(self, user_id: int) -> list:
-        select = self.__select(["user_uid"], ["serverId", "uid"], f"id = {user_id}")
-        response = self.__doSelect(select); result = [None for _ in range(4)]
-        for server_id, uid in list(response): result[server_id] = uid; return result
+        key = ("user_uid", user_id); version = self.__metadata.version(key)
+        cached = self.__metadata.get(key)
+        if cached != None: return list(cached)
+        select = self.__select(["user_uid"], ["serverId", "uid"], "id = :user_id")
+        response = self.__doSelect("selectUserUid", select, user_id = user_id); result = [None for _ in range(4)]
+        for server_id, uid in list(response): result[server_id] = uid
+        return self.__remember(key, result, version)
         
     def selectUserRecentTarget(self, user_id: int) -> list:
-        select = self.__select(["user_target"], ["serverId", "eventId", "targetPoints"], f"id = {user_id}")
-        response = self.__doSelect(select); result = [None for _ in range(4)]
+        key = ("user_target", user_id); version = self.__metadata.version(key)
+        cached = self.__metadata.get(key)
+        if cached != None: return list(cached)
+        select = self.__select(["user_target"], ["serverId", "eventId", "targetPoints"], "id = :user_id")
+        response = self.__doSelect("selectUserRecentTarget", select, user_id = user_id); result = [None for _ in range(4)]
         for server_id, event_id, target_points in list(response): result[server_id] = (target_points, event_id)
-        return result
+        return self.__remember(key, result, version)
     
     def selectChannelSetting(self, channel_id: int) -> list:
-        select = self.__select(["channel_setting"], ["*"], f"id = {channel_id}")
-        result = self.__doSelect(select); return ([] if result == () else list(result)[0])
+        key = ("channel_setting", channel_id); version = self.__metadata.version(key)
+        cached = self.__metadata.get(key)
+        if cached != None: return list(cached)
+        select = self.__select(["channel_setting"], ["*"], "id = :channel_id")
+        result = self.__doSelect("selectChannelSetting", select, channel_id = channel_id)
+        return self.__remember(key, [] if result == () else list(result)[0], version)
+    
+    def selectChangeNotifySubscribers(self) -> list[list[int]]:
+        # Listing users and channels with change notify enabled as [object type, id, server id]
+        users = self.__select(["user_setting"], ["0", "id", "serverId"], "isChangeNotify")[:-1]
+        channels = self.__select(["channel_setting"], ["1", "id", "serverId"], "isChangeNotify")
+        result = self.__doSelect("selectChangeNotifySubscribers", f"{users} UNION ALL {channels}"); return ([] if result == () else list(result))
     
     def selectRecentEventDetail(self, server_id: int) -> list:
+        key = ("recent_event_detail", server_id); version = self.__metadata.version(key)
+        cached = self.__metadata.get(key)
+        if cached != None: return list(cached)
         select = self.__select(["event_detail"], ["*"], 
-                               f"serverId = {server_id} AND startAt <= ROUND(EXTRACT(EPOCH FROM now())) + 14400",
+                               "serverId = :server_id AND startAt <= ROUND(EXTRACT(EPOCH FROM now())) + 14400",
                                order_by = ["startAt DESC"], limit = 1)
-        result = self.__doSelect(select); return ([] if result == () else list(result)[0])
+        result = self.__doSelect("selectRecentEventDetail", select, server_id = server_id)
+        return self.__remember(key, [] if result == () else list(result)[0], version)
     
     def selectRecentMonthlyDetail(self, server_id: int) -> list:
+        key = ("recent_monthly_detail", server_id); version = self.__metadata.version(key)
+        cached = self.__metadata.get(key)
+        if cached != None: return list(cached)
         select = self.__select(["monthly_detail"], ["*"], 
-                               f"serverId = {server_id} AND startAt <= ROUND(EXTRACT(EPOCH FROM now())) + 14400",
+                               "serverId = :server_id AND startAt <= ROUND(EXTRACT(EPOCH FROM now())) + 14400",
                                order_by = ["startAt DESC"], limit = 1)
-        result = self.__doSelect(select); return ([] if result == () else list(result)[0])
+        result = self.__doSelect("selectRecentMonthlyDetail", select, server_id = server_id)
+        return self.__remember(key, [] if result == () else list(result)[0], version)
         
-    def selectEventTopPlayers(self, server_id: int, event_id: int) -> list:
-        select = self.__select(["event_player"], ["*"], f"serverId = {server_id} AND eventId = {event_id}",
-                               order_by = ["nowPoints DESC", "lastUpdateTime ASC"], limit = 10)
-        result = self.__doSelect(select); return list(result)
+    def selectEventSchedules(self, server_id: int, event_ids: list[int]) -> list[list[int]]:
+        select = self.__select(["event_detail"], ["id", "startAt", "endAt"], 
+                               "serverId = :server_id AND id = ANY(CAST(:event_ids AS SMALLINT[]))")
+        result = self.__doSelect("selectEventSchedules", select, server_id = server_id, event_ids = event_ids)
+        return ([] if result == () else list(result))
+        
+    def selectEventCompactedBefore(self, server_id: int, event_id: int) -> int:
+        select = self.__select(["event_compaction"], ["compactedBefore"], "serverId = :server_id AND eventId = :event_id")
+        result = self.__doSelect("selectEventCompactedBefore", select, server_id = server_id, event_id = event_id)
+        return 0 if len(result) == 0 else result[0][0]
+        
+    def selectEventTopPlayersWithSpeed(self, server_id: int, event_id: int, request_time: int) -> list:
+        # Computing recent up time, one-hour speed and both ranks of the top 10 players in one round trip
+        top = self.__select(["event_player"], ["*"], "serverId = :server_id AND eventId = :event_id",
+                            order_by = ["nowPoints DESC", "lastUpdateTime ASC"], limit = 10)[:-1]
+        up = self.__select(["event_ranks"], ["updateTime"], 
+                           "serverId = top.serverId AND eventId = top.eventId AND uid = top.uid"
+                         + " AND (fromRank < 0 OR fromRank > 10) AND (0 <= toRank AND toRank <= 10)", 
+                           order_by = ["updateTime DESC"], limit = 1)[:-1]
+        before = self.__select(["event_points"], ["value"], 
+                               "serverId = top.serverId AND eventId = top.eventId AND uid = top.uid"
+                             + " AND time < :request_time - 3600", order_by = ["value DESC"], limit = 1)[:-1]
+        compacted = self.__select(["event_points_hourly"], ["MAX(maxValue)"], 
+                                  "serverId = top.serverId AND eventId = top.eventId AND uid = top.uid"
+                                + " AND lastTime < :request_time - 3600")[:-1]
+        players = self.__select([f"({top}) AS top"], 
+                                ["serverId", "eventId", "uid", "name", "introduction", "rank", "lastUpdateTime", 
+                                 f"COALESCE(({up}), 0) AS recentUpTime", "nowPoints", 
+                                 "ROW_NUMBER() OVER (ORDER BY nowPoints DESC, lastUpdateTime ASC) AS pointRank", 
+                                 f"nowPoints - GREATEST(COALESCE(({before}), 0), COALESCE(({compacted}), 0)) AS speed"])[:-1]
+        select = self.__select([f"({players}) AS players"], 
+                               ["serverId", "eventId", "uid", "name", "introduction", "rank", "lastUpdateTime", 
+                                "recentUpTime", "nowPoints", "pointRank", 
+                                "CASE WHEN :request_time - recentUpTime <= 3600 THEN -1 ELSE speed END", 
+                                "DENSE_RANK() OVER (ORDER BY CASE WHEN :request_time - recentUpTime <= 3600 "
+                              + "THEN -1 ELSE speed END DESC)"], order_by = ["pointRank ASC"])
+        result = self.__doSelect("selectEventTopPlayersWithSpeed", select, server_id = server_id, event_id = event_id, request_time = request_time)
+        return list(result)
         
     def selectMonthlyTopPlayers(self, server_id: int, monthly_id: int) -> list:
-        select = self.__select(["monthly_player"], ["*"], f"serverId = {server_id} AND monthlyId = {monthly_id}",
+        select = self.__select(["monthly_player"], ["*"], "serverId = :server_id AND monthlyId = :monthly_id",
                                order_by = ["nowPoints DESC", "lastUpdateTime ASC"], limit = 10)
-        result = self.__doSelect(select); return list(result)
-        
-    def selectEventPlayerPointsAtTime(self, server_id: int, event_id: int, uid: int, 
-                                      before: Optional[int] = None, after: Optional[int] = None, 
-                                      limit: Optional[int] = None, with_time: Optional[bool] = False) -> list[list[int]]:
-        conditions = f"serverId = {server_id} AND eventID = {event_id} AND uid = {uid}"
-        if before != None: conditions += f" AND time < {before}"
-        if after != None: conditions += f" AND time >= {after}"
-        select = self.__select(["event_points"], (["time", "value"] if with_time else ["value"]), 
-                               conditions, order_by = ["value DESC"], limit = limit)
-        result = self.__doSelect(select); return ([[0]] if result == () else list(result))
-        
-    def selectEventPlayerPointsNumAtTime(self, server_id: int, event_id: int, uid: int, 
-                                         before: Optional[int] = None, after: Optional[int] = None) -> int:
-        conditions = f"serverId = {server_id} AND eventID = {event_id} AND uid = {uid}"
-        if before != None: conditions += f" AND time < {before}"
-        if after != None: conditions += f" AND time >= {after}"
-        select = self.__select(["event_points"], ["COUNT(uid)"], conditions)
-        result = self.__doSelect(select); return result[0][0]
-        
-    def selectEventPlayerPointsNumHourly(self, server_id: int, event_id: int, uid: int, 
-                                         start_at: int, len: int) -> list[int]:
-        select = self.__select(["event_points"], ["COUNT(uid)", f"((time - {start_at}) / 3600)"], 
-                               f"serverId = {server_id} AND eventID = {event_id} AND uid = {uid}", 
-                               group_by = f"((time - {start_at}) / 3600)", order_by = [f"((time - {start_at}) / 3600)"])
-        response = self.__doSelect(select); result = [0 for _ in range(len)]
-        for num, index in list(response): result[index] = num
-        return list(result)
+        result = self.__doSelect("selectMonthlyTopPlayers", select, server_id = server_id, monthly_id = monthly_id); return list(result)
+        
+    def selectEventPlayerDetail(self, server_id: int, event_id: int, uid: int, 
+                                recent_after: int, ranges_after: list[int]) -> list:
+        # Collecting point total, up times, recent points and every range statistic of one player in one round trip
+        player = "serverId = :server_id AND eventId = :event_id AND uid = :uid"
+        ups = player + " AND (fromRank < 0 OR fromRank > 10) AND (0 <= toRank AND toRank <= 10)"
+        total = self.__select(["event_points_hourly"], ["COALESCE(SUM(pointsNum), 0)"], player)[:-1]
+        ups_time = self.__select(["event_ranks"], ["updateTime"], ups, order_by = ["updateTime ASC"])[:-1]
+        recent = self.__select(["event_points"], ["ARRAY[time, value]"], player + " AND time >= :recent_after", 
+                               order_by = ["value DESC"], 
+                               limit = f"21 + ({self.__select(['event_ranks'], ['COUNT(uid)'], ups)[:-1]})")[:-1]
+        # Counting each range by the hourly counters plus the raw points of its first partial hour
+        counted = self.__select(["event_points_hourly"], ["SUM(pointsNum)"], player + " AND hourTime >= afterTime")[:-1]
+        partial = self.__select(["event_points"], ["COUNT(uid)"], 
+                                player + " AND time >= afterTime AND time < (afterTime + 3599) / 3600 * 3600")[:-1]
+        point_before = self.__select(["event_points"], ["value"], player + " AND time < afterTime", 
+                                     order_by = ["time DESC"], limit = 1)[:-1]
+        compacted = self.__select(["event_points_hourly"], ["MAX(maxValue)"], player + " AND lastTime < afterTime")[:-1]
+        ranges = self.__select(["UNNEST(CAST(:ranges_after AS BIGINT[])) WITH ORDINALITY AS ranges (afterTime, rangeIndex)"], 
+                               [f"ARRAY[COALESCE(({counted}), 0) + ({partial}), "
+                              + f"GREATEST(COALESCE(({point_before}), 0), COALESCE(({compacted}), 0))]"], 
+                               order_by = ["rangeIndex ASC"])[:-1]
+        select = self.__select([], [f"({total})", f"ARRAY({ups_time})", f"ARRAY({recent})", f"ARRAY({ranges})"])
+        result = self.__doSelect("selectEventPlayerDetail", select, server_id = server_id, event_id = event_id, uid = uid, 
+                                 recent_after = recent_after, ranges_after = ranges_after)
+        return list(result[0])
+        
+    def selectEventPlayerDaily(self, server_id: int, event_id: int, uid: int, 
+                               start_at: int, day_split: list[int]) -> list:
+        # Bucketing points by day splits and hours, with stop intervals and rank changes, in one round trip
+        player = "serverId = :server_id AND eventId = :event_id AND uid = :uid"
+        daily = self.__select(["event_points_hourly"], 
+                              ["ARRAY[width_bucket(hourTime, CAST(:day_split AS BIGINT[])), MAX(maxValue)]"], 
+                              player, group_by = "width_bucket(hourTime, CAST(:day_split AS BIGINT[]))")[:-1]
+        hourly = self.__select(["event_points_hourly"], ["ARRAY[CAST((hourTime - :start_at) / 3600 AS INTEGER), "
+                                                      + "CAST(SUM(pointsNum) AS INTEGER)]"], 
+                               player, group_by = "CAST((hourTime - :start_at) / 3600 AS INTEGER)")[:-1]
+        intervals = self.__select(["event_intervals"], ["ARRAY[startTime, endTime, valueDelta]"], 
+                                  player, order_by = ["startTime ASC"])[:-1]
+        ranks = self.__select(["event_ranks"], ["ARRAY[updateTime, fromRank, toRank]"], 
+                              player, order_by = ["updateTime ASC"])[:-1]
+        select = self.__select([], [f"ARRAY({daily})", f"ARRAY({hourly})", f"ARRAY({intervals})", f"ARRAY({ranks})"])
+        result = self.__doSelect("selectEventPlayerDaily", select, server_id = server_id, event_id = event_id, uid = uid, 
+                                 start_at = start_at, day_split = day_split)
+        return list(result[0])
+        
+    def selectEventRankChanges(self, server_id: int, event_id: int, update_time: int) -> list[list]:
+        # Collecting the top 10 rank changes recorded at the update time along with the names of the players
+        select = self.__select(["event_ranks", "event_player"], 
+                               ["event_ranks.uid", "event_player.name", "fromRank", "toRank"], 
+                               "event_ranks.serverId = :server_id AND event_ranks.eventId = :event_id "
+                             + "AND event_ranks.updateTime = :update_time AND fromRank <> toRank "
+                             + "AND (fromRank BETWEEN 1 AND 10 OR toRank BETWEEN 1 AND 10) "
+                             + "AND event_player.serverId = event_ranks.serverId AND event_player.eventId = event_ranks.eventId "
+                             + "AND event_player.uid = event_ranks.uid", order_by = ["toRank ASC"])
+        result = self.__doSelect("selectEventRankChanges", select, server_id = server_id, event_id = event_id, update_time = update_time)
+        return ([] if result == () else list(result))
+    
+class AsyncDatabase:
+    def __init__(self, database: Database):
+        # Exposing awaitable versions of the select and insert methods, running on the pooled executor
+        self.database: Database = database
         
-    def selectEventPlayerIntervals(self, server_id: int, event_id: int, uid: int) -> list[list[int]]:
-        select = self.__select(["event_intervals"], ["startTime", "endTime", "valueDelta"], 
-                               f"serverId = {server_id} AND eventID = {event_id} AND uid = {uid}", 
-                               order_by = ["startTime ASC"])
-        result = self.__doSelect(select); return ([] if result == () else list(result))
-        
-    def selectEventPlayerRanks(self, server_id: int, event_id: int, uid: int) -> list[list[int]]:
-        select = self.__select(["event_ranks"], ["updateTime", "fromRank", "toRank"], 
-                               f"serverId = {server_id} AND eventID = {event_id} AND uid = {uid}", 
-                               order_by = ["updateTime ASC"])
-        result = self.__doSelect(select); return ([] if result == () else list(result))
-    
-    def selectEventPlayerUpsTime(self, server_id: int, event_id: int, uid: int, 
-                                 limit: Optional[int] = None) -> list[int]:
-        select = self.__select(["event_ranks"], ["updateTime"], 
-                               f"serverId = {server_id} AND eventID = {event_id} AND uid = {uid}"
-                             + f" AND (fromRank < 0 OR fromRank > 10) AND (0 <= toRank AND toRank <= 10)", limit = limit)
-        result = self.__doSelect(select); return [value[0] for value in list(result)]
-        
-    def selectEventPlayerDownsTime(self, server_id: int, event_id: int, uid: int, 
-                                   limit: Optional[int] = None) -> list[int]:
-        select = self.__select(["event_ranks"], ["updateTime"], 
-                               f"serverId = {server_id} AND eventID = {event_id} AND uid = {uid}"
-                             + f" AND (0 < fromRank AND fromRank <= 10) AND (toRank < 0 OR toRank > 10)", 
-                               order_by = ["updateTime DESC"], limit = limit)
-        result = self.__doSelect(select); return [value[0] for value in list(result)]
+    def __getattr__(self, name: str) -> Callable:
+        if not name.startswith(("select", "insert")): 
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        method: Callable = getattr(self.database, name)
+        async def awaitable(*args, **kwargs) -> Any: return await self.database.run(method, *args, **kwargs)
+        return awaitable
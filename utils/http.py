@@ -0,0 +1,71 @@
+import aiohttp, json, time
+from multidict import CIMultiDict
+from typing import Optional, Any
+
+class Response:
+    def __init__(self, status_code: int, headers: CIMultiDict, content: bytes, encoding: Optional[str] = None):
+        # Holding a fully read body with the attributes of requests.Response, which the parser consumes
+        self.status_code: int = status_code
+        self.headers: CIMultiDict = headers
+        self.content: bytes = content
+        self.encoding: str = "utf-8" if encoding == None else encoding
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors = "replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+class HTTPClient:
+    def __init__(self, limit: Optional[int] = 16, limit_per_host: Optional[int] = 4,
+                 keepalive_timeout: Optional[float] = 60):
+        # Reusing connections per host across calls, where the session is opened lazily inside the running loop
+        self.limit: int = limit
+        self.limit_per_host: int = limit_per_host
+        self.keepalive_timeout: float = keepalive_timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def __session(self) -> aiohttp.ClientSession:
+        if self.session == None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit = self.limit, limit_per_host = self.limit_per_host,
+                                             keepalive_timeout = self.keepalive_timeout, ttl_dns_cache = 300)
+            self.session = aiohttp.ClientSession(connector = connector)
+        return self.session
+
+    async def get(self, url: str, headers: Optional[dict[str, str]] = None, timeout: Optional[float] = 4) -> Response:
+        async with self.__session().get(url, headers = headers, timeout = aiohttp.ClientTimeout(total = timeout)) as response:
+            return Response(response.status, CIMultiDict(response.headers), await response.read(), response.charset)
+
+    async def close(self) -> None:
+        if self.session != None: await self.session.close()
+        self.session = None; return
+
+class CircuitBreaker:
+    def __init__(self, threshold: Optional[int] = 2, backoff: Optional[float] = 30, max_backoff: Optional[float] = 900):
+        # Opening after threshold consecutive failures, then Letting one probe through each time the backoff
+        # elapses, where every failed probe doubles the backoff up to max backoff
+        self.threshold: int = threshold
+        self.backoff: float = backoff
+        self.max_backoff: float = max_backoff
+        self.failures: int = 0
+        self.next_backoff: float = backoff
+        self.opened_until: float = 0
+
+    def isClosed(self) -> bool:
+        return self.failures == 0
+
+    def allow(self) -> bool:
+        if self.failures < self.threshold: return True
+        if time.monotonic() < self.opened_until: return False
+        self.opened_until = time.monotonic() + self.next_backoff; return True
+
+    def succeed(self) -> None:
+        self.failures = 0; self.next_backoff = self.backoff; return
+
+    def fail(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_until = time.monotonic() + self.next_backoff
+            self.next_backoff = min(self.next_backoff * 2, self.max_backoff)
+        return
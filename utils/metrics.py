@@ -0,0 +1,121 @@
+import time, threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Iterator, Union
+
+DEFAULT_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def formatLabels(names: list[str], values: tuple[str, ...], extra: Optional[dict[str, str]] = {}) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if pairs == []: return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join([f"{name}=\"{escape(value)}\"" for name, value in pairs]) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Optional[list[str]] = []):
+        self.name: str = name
+        self.help: str = help
+        self.labels: list[str] = labels
+        self.values: dict[tuple[str, ...], float] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def inc(self, amount: Optional[float] = 1, **labels) -> None:
+        key = tuple([str(labels[name]) for name in self.labels])
+        with self.lock: self.values[key] = self.values.get(key, 0) + amount
+        return
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in self.values.items(): lines.append(f"{self.name}{formatLabels(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Optional[list[str]] = [],
+                 buckets: Optional[tuple[float, ...]] = DEFAULT_BUCKETS):
+        # Keeping cumulative counts per upper bound of buckets, with the sum and count of observations
+        self.name: str = name
+        self.help: str = help
+        self.labels: list[str] = labels
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        self.values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple([str(labels[name]) for name in self.labels])
+        with self.lock:
+            counts, total, count = self.values.get(key, ([0 for _ in self.buckets], 0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound: counts[index] += 1
+            self.values[key] = (counts, total + value, count + 1)
+        return
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try: yield
+        finally: self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total, count) in self.values.items():
+                for bound, bound_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{formatLabels(self.labels, key, {'le': str(bound)})} {bound_count}")
+                lines.append(f"{self.name}_bucket{formatLabels(self.labels, key, {'le': '+Inf'})} {count}")
+                lines.append(f"{self.name}_sum{formatLabels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{formatLabels(self.labels, key)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        # Holding the metrics of a process, which is shared by the collector, the database and the cogs
+        self.metrics: dict[str, Union[Counter, Histogram]] = {}
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def counter(self, name: str, help: str, labels: Optional[list[str]] = []) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Optional[list[str]] = [],
+                  buckets: Optional[tuple[float, ...]] = DEFAULT_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        return "\n".join([line for metric in list(self.metrics.values()) for line in metric.render()]) + "\n"
+
+    def serve(self, port: int, host: Optional[str] = "127.0.0.1") -> None:
+        # Exposing the metrics in the text format of Prometheus on a daemon thread, once per process
+        if self.server != None: return
+        registry = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics": self.send_error(404); return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers(); self.wfile.write(body); return
+
+            def log_message(self, format: str, *args) -> None: return
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target = self.server.serve_forever, name = "metrics", daemon = True).start(); return
+
+REGISTRY: Registry = Registry()
+
+FETCH_SECONDS: Histogram = REGISTRY.histogram(
+    "stare_fetch_seconds", "Duration of requests to upstream servers", ["source"])
+PARSE_SECONDS: Histogram = REGISTRY.histogram(
+    "stare_parse_seconds", "Duration of decoding responses from upstream servers", ["source"])
+INGEST_SECONDS: Histogram = REGISTRY.histogram(
+    "stare_ingest_seconds", "Duration of writing snapshots into the database", ["kind"])
+QUERY_SECONDS: Histogram = REGISTRY.histogram(
+    "stare_query_seconds", "Duration of database methods run on the executor", ["method"])
+STATEMENT_SECONDS: Histogram = REGISTRY.histogram(
+    "stare_statement_seconds", "Duration of single statements by the database method issuing them", ["method"])
+COMMAND_SECONDS: Histogram = REGISTRY.histogram(
+    "stare_command_seconds", "Duration from the interaction to the completion of commands", ["command"])
+UPSTREAM_ERRORS: Counter = REGISTRY.counter(
+    "stare_upstream_errors_total", "Failed requests to upstream servers", ["source"])
+BESTDORI_FALLBACKS: Counter = REGISTRY.counter(
+    "stare_bestdori_fallbacks_total", "Fetches falling back to Bestdori while the game is configured", ["kind"])
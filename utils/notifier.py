@@ -0,0 +1,89 @@
+import asyncio, traceback
+from typing import Optional
+from logging import Logger
+
+from discord import embeds, Color, HTTPException
+from discord.ext import commands
+
+from utils.logger import getLogger
+from utils.db_pg import Database
+from objs.activity import SERVER_NAME
+
+class RankNotifier:
+    def __init__(self, bot: commands.Bot, database: Database,
+                 batch_window: Optional[float] = 5, send_interval: Optional[float] = 0.05):
+        # Indexing subscribed users and channels by server, so a change only touches its own subscribers,
+        # where sends are batched per window and paced under the global rate limit of Discord
+        self.bot: commands.Bot = bot
+        self.database: Database = database
+        self.logger: Logger = getLogger(__name__)
+        self.batch_window: float = batch_window
+        self.send_interval: float = send_interval
+        self.subscribers: list[set[tuple[int, int]]] = [set() for _ in SERVER_NAME]
+        self.changes: asyncio.Queue = asyncio.Queue()
+
+    async def load(self) -> None:
+        for object_type, object_id, server_id in await self.database.aio.selectChangeNotifySubscribers():
+            self.subscribers[server_id].add((object_type, object_id))
+        return
+
+    def subscribe(self, object_type: int, object_id: int, server_id: int, enabled: bool) -> None:
+        # Moving the subscriber to its current server, or Dropping it when disabled
+        for subscribers in self.subscribers: subscribers.discard((object_type, object_id))
+        if enabled: self.subscribers[server_id].add((object_type, object_id))
+        return
+
+    async def onRankChange(self, channel: str, payload: str) -> None:
+        # Parsing the payload "<server id>:<event id>:<update time>" sent by the trigger on new ranks
+        server_id, event_id, update_time = [int(value) for value in payload.split(":")]
+        if len(self.subscribers[server_id]) == 0: return
+        changes = await self.database.aio.selectEventRankChanges(server_id, event_id, update_time)
+        if changes != []: await self.changes.put((server_id, update_time, changes))
+        return
+
+    def __rank(self, rank: int) -> str:
+        if rank == -1: return "🆕"
+        return f":number_{rank}:" if rank <= 10 else f"`{rank}`"
+
+    def __embed(self, server_id: int, batch: list[tuple[int, list[list]]]) -> embeds.Embed:
+        lines: list[str] = [f"<t:{update_time}:T> {self.__rank(from_rank)} ➔ {self.__rank(to_rank)} **{name}**"
+                            for update_time, changes in batch for _, name, from_rank, to_rank in changes]
+        return embeds.Embed(
+            title = f"**{SERVER_NAME[server_id]}** Top 10 排名變更",
+            description = "\n".join(lines[-30:]),
+            color = Color.from_rgb(r = 51, g = 51, b = 255)
+        )
+
+    async def __send(self, object_type: int, object_id: int, embed: embeds.Embed) -> None:
+        try:
+            if object_type == 0:
+                target = self.bot.get_user(object_id) or await self.bot.fetch_user(object_id)
+            else:
+                target = self.bot.get_channel(object_id)
+                if target == None: return
+            await target.send(embed = embed)
+        except HTTPException: self.logger.warning(f"Rank change notification to {object_id} is not delivered")
+        except Exception: 
+            # Keeping the dispatcher alive for the other subscribers whatever goes wrong with this one
+            self.logger.warning(f"Rank change notification to {object_id} failed\n{traceback.format_exc()}")
+        return
+
+    async def dispatch(self) -> None:
+        while True:
+            # Collecting every change arriving within the window, so each subscriber gets one message per server
+            batches: list[list[tuple[int, list[list]]]] = [[] for _ in SERVER_NAME]
+            server_id, update_time, changes = await self.changes.get()
+            batches[server_id].append((update_time, changes))
+            await asyncio.sleep(self.batch_window)
+            while not self.changes.empty():
+                server_id, update_time, changes = self.changes.get_nowait()
+                batches[server_id].append((update_time, changes))
+
+            for server_id, batch in enumerate(batches):
+                if batch == []: continue
+                try: embed = self.__embed(server_id, batch)
+                except Exception: 
+                    self.logger.warning(f"Rank changes of {SERVER_NAME[server_id]} are not rendered\n{traceback.format_exc()}")
+                    continue
+                for object_type, object_id in list(self.subscribers[server_id]):
+                    await self.__send(object_type, object_id, embed); await asyncio.sleep(self.send_interval)
@@ -0,0 +1,42 @@
+import asyncio, heapq, time, traceback
+from typing import Optional, Callable, Awaitable
+from logging import Logger
+
+class Scheduler:
+    def __init__(self, logger: Optional[Logger] = None):
+        # Running named jobs one at a time by their nearest deadline, where each cadence decides the next delay
+        # after its job finishes, and a cadence returning None pauses the job until it is woken
+        self.logger: Optional[Logger] = logger
+        self.jobs: dict[str, tuple[Callable[[], Awaitable], Callable[[], Optional[float]]]] = {}
+        self.deadlines: list[tuple[float, str]] = []
+        self.changed: asyncio.Event = asyncio.Event()
+
+    def add(self, name: str, job: Callable[[], Awaitable], cadence: Callable[[], Optional[float]],
+            delay: Optional[float] = 0) -> None:
+        self.jobs[name] = (job, cadence); self.wake(name, delay); return
+
+    def wake(self, name: str, delay: Optional[float] = 0) -> None:
+        # Replacing the pending deadline of the job, so it runs after the delay regardless of its cadence
+        self.deadlines = [(deadline, job_name) for deadline, job_name in self.deadlines if job_name != name]
+        heapq.heapify(self.deadlines); heapq.heappush(self.deadlines, (time.monotonic() + delay, name))
+        self.changed.set(); return
+
+    async def run(self) -> None:
+        while True:
+            self.changed.clear()
+            if self.deadlines == []: await self.changed.wait(); continue
+            delay = self.deadlines[0][0] - time.monotonic()
+            if delay > 0:
+                try: await asyncio.wait_for(self.changed.wait(), delay)
+                except asyncio.TimeoutError: pass
+                continue
+
+            _, name = heapq.heappop(self.deadlines)
+            job, cadence = self.jobs[name]
+            try: await job()
+            except asyncio.CancelledError: raise
+            except:
+                if self.logger != None: self.logger.warning(f"Job {name} failed\n{traceback.format_exc()}")
+            interval = cadence()
+            if interval != None and all(job_name != name for _, job_name in self.deadlines):
+                heapq.heappush(self.deadlines, (time.monotonic() + interval, name))